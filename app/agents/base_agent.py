@@ -1,16 +1,60 @@
 from abc import ABC, abstractmethod
+import threading
+import time
 from typing import Any, Dict, Optional
+from ..core.metrics import AGENT_ERRORS, AGENT_SECONDS, WARM_UP_SECONDS
 
 class BaseAgent(ABC):    
     def __init__(self, name: str, config: Optional[Dict[str, Any]] = None):
         self.name = name
         self.config = config or {}
+        # pending -> warming_up -> ready, or failed (retried on the next warm_up call).
+        self.state = "pending"
+        self.warm_up_seconds: Optional[float] = None
+        self.warm_up_error: Optional[str] = None
+        self._warm_up_lock = threading.Lock()
         self._initialize()
     
     @abstractmethod
     def _initialize(self) -> None:
         pass
     
+    def _warm_up(self) -> None:
+        """Load models, indexes and heavy modules; _initialize must stay cheap."""
+        pass
+    
+    def warm_up(self) -> None:
+        """Run _warm_up once; called in the background on startup or by the first request that needs it."""
+        if self.state == "ready":
+            return
+        with self._warm_up_lock:
+            if self.state == "ready":
+                return
+            self.state = "warming_up"
+            start = time.perf_counter()
+            try:
+                self._warm_up()
+            except Exception as e:
+                self.state = "failed"
+                self.warm_up_error = str(e)
+                raise
+            finally:
+                self.warm_up_seconds = round(time.perf_counter() - start, 4)
+                WARM_UP_SECONDS.set(self.warm_up_seconds, agent=self.name)
+            self.warm_up_error = None
+            self.state = "ready"
+    
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "warm_up_seconds": self.warm_up_seconds,
+            "error": self.warm_up_error
+        }
+    
     @abstractmethod
     def process(self, input_data: Any) -> Any:
         pass
@@ -20,18 +64,33 @@ class BaseAgent(ABC):
         pass
     
     def run(self, input_data: Any) -> Any:
-        if not self.validate(input_data):
-            raise ValueError(f"Invalid input data for agent {self.name}")
-        return self.process(input_data)
+        start = time.perf_counter()
+        try:
+            if not self.validate(input_data):
+                raise ValueError(f"Invalid input data for agent {self.name}")
+            return self.process(input_data)
+        except Exception:
+            AGENT_ERRORS.inc(agent=self.name)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=self.name)
     
     async def run_async(self, input_data: Any) -> Any:
-        if not await self.validate(input_data):
-            raise ValueError(f"Invalid input data for agent {self.name}")
-        return await self.process(input_data)
+        start = time.perf_counter()
+        try:
+            if not await self.validate(input_data):
+                raise ValueError(f"Invalid input data for agent {self.name}")
+            return await self.process(input_data)
+        except Exception:
+            AGENT_ERRORS.inc(agent=self.name)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=self.name)
     
     def get_status(self) -> Dict[str, Any]:
         return {
             "name": self.name,
             "status": "operational",
+            "state": self.state,
             "config": self.config
         } 
\ No newline at end of file
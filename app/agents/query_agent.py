@@ -1,96 +1,140 @@
 from typing import Any, Dict, List, Optional
-import google.generativeai as genai
 from .base_agent import BaseAgent
+from ..core.llm_client import genai, get_llm_client
+from ..core.metrics import record_llm_usage
 import json
-import os
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+QUERY_TYPES = ("factual", "procedural", "conceptual", "troubleshooting", "comparison")
+
+DEFAULT_METADATA = {
+    "query_type": "unknown",
+    "priority": 3,
+    "complexity": 3,
+    "required_context": []
+}
+
+QUERY_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "concepts": {"type": "array", "items": {"type": "string"}},
+        "reformulations": {"type": "array", "items": {"type": "string"}},
+        "metadata": {
+            "type": "object",
+            "properties": {
+                "query_type": {"type": "string", "enum": list(QUERY_TYPES)},
+                "priority": {"type": "integer"},
+                "complexity": {"type": "integer"},
+                "required_context": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["query_type", "priority", "complexity", "required_context"]
+        }
+    },
+    "required": ["concepts", "reformulations", "metadata"]
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "can", "do", "does", "for", "from", "how", "i", "in", "is", "it",
+    "of", "on", "or", "the", "to", "what", "when", "where", "which", "who", "why", "with", "you"
+}
 
 class QueryUnderstandingAgent(BaseAgent):
     def _initialize(self) -> None:
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model = genai.GenerativeModel(self.config.get("model", "gemini-2.0-flash"))
-        self.max_tokens = self.config.get("max_tokens", 150)
+        self.llm = get_llm_client()
+        self.model_name = self.config.get("model", "gemini-2.0-flash")
+        self.max_tokens = self.config.get("max_tokens", 300)
         self.temperature = self.config.get("temperature", 0.7)
+        self.max_reformulations = self.config.get("max_reformulations", 3)
+    
+    def _warm_up(self) -> None:
+        self.llm.configure()
     
     async def validate(self, input_data: str) -> bool:
         return isinstance(input_data, str) and len(input_data.strip()) > 0
     
-    def process(self, input_data: str) -> Dict[str, Any]:
-        concepts = self._extract_concepts(input_data)
-        
-        reformulations = self._generate_reformulations(input_data, concepts)
-        
-        query_metadata = self._analyze_query(input_data)
-        
-        return {
-            "original_query": input_data,
-            "concepts": concepts,
-            "reformulations": reformulations,
-            "metadata": query_metadata
-        }
-    
-    def _extract_concepts(self, query: str) -> List[str]:
+    async def process(self, input_data: str) -> Dict[str, Any]:
         prompt = f"""
-        Extract the key concepts from the following query. Return only the concepts as a comma-separated list:
+        Analyze the following query and return a JSON object with:
+        1. concepts: the key concepts in the query
+        2. reformulations: {self.max_reformulations} alternative formulations of the query, focusing on those concepts
+        3. metadata: query_type (one of {', '.join(QUERY_TYPES)}), priority (1-5, where 5 is highest),
+           complexity (1-5, where 5 is highest) and required_context (list of context types needed)
         
-        Query: {query}
+        Query: {input_data}
         """
         
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=self.temperature,
-                max_output_tokens=self.max_tokens,
+        try:
+            self.warm_up()
+            response = await self.llm.generate(
+                self.model_name,
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=self.temperature,
+                    max_output_tokens=self.max_tokens,
+                    response_mime_type="application/json",
+                    response_schema=QUERY_ANALYSIS_SCHEMA,
+                )
             )
-        )
+            record_llm_usage(self.name, response)
+            analysis = self._parse_analysis(input_data, response.text)
+        except Exception as e:
+            logger.warning("Query analysis failed, using fallback: %s", e)
+            analysis = self._fallback_analysis(input_data)
         
-        concepts = response.text.strip().split(",")
-        return [concept.strip() for concept in concepts]
+        return {"original_query": input_data, **analysis}
     
-    async def _generate_reformulations(self, query: str, concepts: List[str]) -> List[str]:
-        prompt = f"""
-        Generate 3 alternative formulations of the following query, focusing on these key concepts: {', '.join(concepts)}
-        
-        Original query: {query}
-        
-        Return only the reformulations as a comma-separated list.
-        """
-        
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=self.temperature,
-                max_output_tokens=self.max_tokens,
-            )
-        )
-        
-        reformulations = response.text.strip().split(",")
-        return [reform.strip() for reform in reformulations]
+    def quick_analysis(self, query: str) -> Dict[str, Any]:
+        """Keyword-only analysis without an LLM call, for requests that skip query analysis."""
+        return {"original_query": query, **self._fallback_analysis(query)}
     
-    async def _analyze_query(self, query: str) -> Dict[str, Any]:
-        prompt = f"""
-        Analyze the following query and return a JSON object with:
-        1. query_type (e.g., 'factual', 'procedural', 'conceptual')
-        2. priority (1-5, where 5 is highest)
-        3. complexity (1-5, where 5 is highest)
-        4. required_context (list of context types needed)
+    def _parse_analysis(self, query: str, text: str) -> Dict[str, Any]:
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("query analysis is not a JSON object")
         
-        Query: {query}
-        """
+        concepts = self._string_list(data.get("concepts"))
+        normalized_query = query.strip().lower()
+        reformulations = [
+            reformulation for reformulation in dict.fromkeys(self._string_list(data.get("reformulations")))
+            if reformulation.lower() != normalized_query
+        ][:self.max_reformulations]
         
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=self.temperature,
-                max_output_tokens=self.max_tokens,
-            )
-        )
+        raw_metadata = data.get("metadata") if isinstance(data.get("metadata"), dict) else {}
+        query_type = raw_metadata.get("query_type")
+        metadata = {
+            "query_type": query_type if query_type in QUERY_TYPES else DEFAULT_METADATA["query_type"],
+            "priority": self._score(raw_metadata.get("priority")),
+            "complexity": self._score(raw_metadata.get("complexity")),
+            "required_context": self._string_list(raw_metadata.get("required_context"))
+        }
         
-        try:
-            return json.loads(response.text)
-        except json.JSONDecodeError:
-            return {
-                "query_type": "unknown",
-                "priority": 3,
-                "complexity": 3,
-                "required_context": []
-            } 
\ No newline at end of file
+        return {
+            "concepts": concepts or self._fallback_concepts(query),
+            "reformulations": reformulations,
+            "metadata": metadata
+        }
+    
+    def _fallback_analysis(self, query: str) -> Dict[str, Any]:
+        return {
+            "concepts": self._fallback_concepts(query),
+            "reformulations": [],
+            "metadata": dict(DEFAULT_METADATA),
+            "fallback": True
+        }
+    
+    def _fallback_concepts(self, query: str) -> List[str]:
+        words = re.findall(r"[\w.\-/]+", query.lower())
+        return list(dict.fromkeys(word for word in words if word not in STOPWORDS and len(word) > 2))
+    
+    def _string_list(self, value: Any) -> List[str]:
+        if not isinstance(value, list):
+            return []
+        return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+    
+    def _score(self, value: Any) -> int:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return 3
+        return min(5, max(1, int(value)))
@@ -1,34 +1,83 @@
-from typing import Any, Dict, List, Optional
-import google.generativeai as genai
+from typing import Any, AsyncIterator, Dict, List, Optional
 from .base_agent import BaseAgent
+from ..core.llm_client import genai, get_llm_client
+from ..core.metrics import record_llm_usage
 import json
-import os
+import uuid
 
 class ResponseGenerationAgent(BaseAgent):    
     def _initialize(self) -> None:
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model = genai.GenerativeModel(self.config.get("model", "gemini-2.0-flash"))
+        self.llm = get_llm_client()
+        self.model_name = self.config.get("model", "gemini-2.0-flash")
         self.max_tokens = self.config.get("max_tokens", 500)
         self.temperature = self.config.get("temperature", 0.7)
+        # "background" scores responses off the critical path, "inline" waits for it, "off" skips it.
+        self.quality_analysis = self.config.get("quality_analysis", "background")
         self.system_prompt = self.config.get(
             "system_prompt",
             "You are an expert FAQ response generator. Generate clear, concise and accurate responses based on the provided context."
         )
     
+    def _warm_up(self) -> None:
+        self.llm.configure()
+    
     async def validate(self, input_data: Dict[str, Any]) -> bool:
         required_keys = ["query", "context"]
         return all(key in input_data for key in required_keys) and isinstance(input_data["context"], list)
     
-    def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        self.warm_up()
         query = input_data["query"]
         context = input_data["context"]
-
+        
+        response = await self.llm.generate(
+            self.model_name,
+            self._build_prompt(query, context),
+            generation_config=self._generation_config()
+        )
+        record_llm_usage(self.name, response)
+        
+        return {
+            "query": query,
+            "response": response.text.strip(),
+            "response_id": str(uuid.uuid4()),
+            "context_used": len(context)
+        }
+    
+    async def stream(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        if not await self.validate(input_data):
+            raise ValueError(f"Invalid input data for agent {self.name}")
+        self.warm_up()
+        
+        last_chunk = None
+        async for chunk in self.llm.stream(
+            self.model_name,
+            self._build_prompt(input_data["query"], input_data["context"]),
+            generation_config=self._generation_config()
+        ):
+            last_chunk = chunk
+            if chunk.text:
+                yield chunk.text
+        # Streamed usage is cumulative; the final chunk carries the totals.
+        record_llm_usage(self.name, last_chunk)
+    
+    async def analyze_quality(self, query: str, context: List[Dict[str, Any]], response: str) -> Dict[str, Any]:
+        self.warm_up()
+        return await self._analyze_response_quality(query=query, context=context, response=response)
+    
+    def _generation_config(self) -> Any:
+        return genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens,
+        )
+    
+    def _build_prompt(self, query: str, context: List[Dict[str, Any]]) -> str:
         context_text = "\n\n".join([
-            f"Document {i+1}:\n{doc['document']}"
+            f"Document {i+1}{self._describe_source(doc)}:\n{doc['document']}"
             for i, doc in enumerate(context)
         ])
 
-        prompt = f"""
+        return f"""
         {self.system_prompt}
         
         Based on the following context, please provide a clear and accurate answer to the query.
@@ -44,31 +93,13 @@ class ResponseGenerationAgent(BaseAgent):
         3. Is clear and concise
         4. Maintains a professional tone
         """
-        
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=self.temperature,
-                max_output_tokens=self.max_tokens,
-            )
-        )
-        
-        generated_response = response.text.strip()
-        
-        quality_metrics = self._analyze_response_quality(
-            query=query,
-            context=context,
-            response=generated_response
-        )
-        
-        return {
-            "query": query,
-            "response": generated_response,
-            "quality_metrics": quality_metrics,
-            "context_used": len(context)
-        }
     
-    def _analyze_response_quality(self, query: str, context: List[Dict[str, Any]], response: str) -> Dict[str, Any]:
+    def _describe_source(self, doc: Dict[str, Any]) -> str:
+        metadata = doc.get("metadata") or {}
+        parts = [part for part in (metadata.get("source"), metadata.get("section")) if part]
+        return f" ({' - '.join(parts)})" if parts else ""
+    
+    async def _analyze_response_quality(self, query: str, context: List[Dict[str, Any]], response: str) -> Dict[str, Any]:
         prompt = f"""
         Analyze the following FAQ response and return a JSON object with:
         1. relevance_score (1-5, where 5 is highest)
@@ -82,13 +113,15 @@ class ResponseGenerationAgent(BaseAgent):
         Response: {response}
         """
         
-        analysis = self.model.generate_content(
+        analysis = await self.llm.generate(
+            self.model_name,
             prompt,
             generation_config=genai.types.GenerationConfig(
                 temperature=0.3,
                 max_output_tokens=200,
             )
         )
+        record_llm_usage(f"{self.name}_quality", analysis)
         
         try:
             return json.loads(analysis.text)
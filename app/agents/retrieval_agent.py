@@ -1,69 +1,812 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 from .base_agent import BaseAgent
+from ..core.batching import MicroBatcher
+from ..core.bm25 import BM25Index
+from ..core.chunking import document_id
+from ..core.document_store import DocumentStore, json_store
+from ..core.concurrency import ReadWriteLock
+from ..core.embedding_cache import EmbeddingCache
+from ..core.embedding_engine import EmbeddingEngine
+from ..core.fusion import reciprocal_rank_fusion, weighted_score_fusion
+from ..core.index_store import IndexSnapshotStore
+from ..core.lazy import lazy_import, timed_import
+from ..core.metrics import RETRIEVAL_SECONDS, record_stage
+from ..core.vector_index import (
+    build_id_index, describe_index, exact_rerank, index_bytes, index_config, index_ids, index_kind, index_storage,
+    is_id_mapped, min_train_size, rebuild_with_ids, reconstruct_with_ids, remove_ids, search_params,
+    uses_inner_product
+)
+from ..core.vector_store import VectorStore
+
+faiss = lazy_import("faiss")
+
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+
+logger = logging.getLogger(__name__)
 
 class RetrievalAgent(BaseAgent):    
     def _initialize(self) -> None:
         self.model_name = self.config.get("model_name", "all-MiniLM-L6-v2")
-        self.embedding_model = SentenceTransformer(self.model_name)
+        # The embedding model, embedding cache and persisted index are loaded by warm_up.
+        self.embedding_model = None
+        self.dimension: Optional[int] = None
         self.index = None
-        self.documents = []
+        # Text, metadata and ids live in compact byte-buffer stores rather than lists of Python objects.
+        self.document_compression = self.config.get("document_compression") or None
+        self.document_block_size = self.config.get("document_block_size", 64 * 1024)
+        # Row i holds documents[i] under the stable id document_ids[i] and FAISS label labels[i].
+        self.documents, self.metadata, self.document_ids = self._new_stores()
+        self.labels = np.zeros(0, dtype=np.int64)
+        self._row_by_id: Dict[str, int] = {}
+        self._row_by_label = np.zeros(0, dtype=np.int64)
+        self._next_label = 0
+        # HNSW cannot delete vectors: removed labels are filtered out during search
+        # and the graph is rebuilt once they exceed tombstone_ratio of the index.
+        self.tombstone_ratio = self.config.get("tombstone_ratio", 0.2)
+        self._tombstones = np.zeros(0, dtype=np.int64)
+        # Labels of a bulk add still being streamed into the live index, hidden from searches
+        # until their documents are published.
+        self._pending_labels: Optional[Tuple[int, int]] = None
+        self._tombstone_selector = None
+        self.index_config = index_config(self.config)
+        # Quantized indexes can re-rank fetch_k * rerank_factor candidates against full-precision
+        # vectors kept row-aligned in a float32 sidecar (memory-mapped from snapshots).
+        self.rerank = self.config.get("rerank", False)
+        self.rerank_factor = max(1, self.config.get("rerank_factor", 4))
+        self.rerank_vectors: Optional[VectorStore] = None
+        self.multi_query = self.config.get("multi_query", False)
+        self.multi_query_fanout = self.config.get("multi_query_fanout", 2)
+        self.rrf_k = self.config.get("rrf_k", 60)
+        # BM25 runs next to the dense index so exact identifiers (CLI flags, config keys,
+        # API names) can be matched lexically; "hybrid" fuses both rankings.
+        self.lexical_enabled = self.config.get("lexical_index", True)
+        self.retrieval_mode = self.config.get("retrieval_mode", "dense")
+        if self.retrieval_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown retrieval mode {self.retrieval_mode!r}; expected one of {', '.join(SEARCH_MODES)}")
+        if self.retrieval_mode != "dense" and not self.lexical_enabled:
+            raise ValueError(f"Retrieval mode {self.retrieval_mode!r} needs the lexical index")
+        self.hybrid_fusion = self.config.get("hybrid_fusion", "rrf")
+        self.dense_weight = self.config.get("dense_weight", 1.0)
+        self.lexical_weight = self.config.get("lexical_weight", 1.0)
+        self.lexical_index = self._new_lexical_index()
+        self.embedding_cache = None
+        # Ingestion encodes through a length-bucketed engine (optionally a process pool) and
+        # streams ingest_chunk_size embeddings at a time into the index.
+        self.embedding_engine = None
+        self.ingest_chunk_size = max(1, self.config.get("ingest_chunk_size", 2048))
+
+        # Encoding and FAISS search are CPU-bound; run them off the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config.get("search_workers", 4),
+            thread_name_prefix=f"{self.name}-search"
+        )
+        self._lock = ReadWriteLock()
+        # Concurrent single-query requests are coalesced into one encode + search.
+        self.batcher = None
+        if self.config.get("micro_batching", True):
+            self.batcher = MicroBatcher(
+                self.search_batch,
+                max_batch_size=self.config.get("max_batch_size", 32),
+                max_wait_ms=self.config.get("batch_window_ms", 2.0),
+                executor=self._executor
+            )
+        self._write_mutex = threading.RLock()
+
+        self.generation = 0
+        # Bumped on every in-process corpus change; used to invalidate derived caches.
+        self.corpus_version = 0
+        self.auto_save = self.config.get("auto_save", True)
+        self.use_mmap = self.config.get("mmap", True)
+        # Shared mode: every worker process maps the current generation in index_dir read-only
+        # and follows CURRENT; a write takes the store's lock, applies the change on top of
+        # the latest generation and publishes a new one.
+        self.shared_index = self.config.get("shared_index", False)
+        self.refresh_interval = self.config.get("refresh_interval_seconds", 1.0)
+        if self.shared_index:
+            if not self.config.get("index_dir"):
+                raise ValueError("shared_index requires index_dir")
+            self.auto_save = True
+            self.use_mmap = True
+        # A snapshot rewrites the whole index and document store, so small writes can share one:
+        # with an interval, the save runs that many seconds after the first unsaved write.
+        # Shared indexes publish every write as a generation and always save at once.
+        self.save_interval = 0.0 if self.shared_index else self.config.get("save_interval_seconds", 0.0)
+        self._save_timer: Optional[threading.Timer] = None
+        self._index_path = None
+        self._index_mmapped = False
+        self.snapshot_store = None
+        if self.config.get("index_dir"):
+            self.snapshot_store = IndexSnapshotStore(
+                self.config["index_dir"],
+                keep_generations=self.config.get("keep_generations", 2)
+            )
+    
+    def _warm_up(self) -> None:
+        self.embedding_model = timed_import("sentence_transformers").SentenceTransformer(self.model_name)
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
+        if self.config.get("embedding_cache_size", 10000) > 0 or self.config.get("embedding_cache_dir"):
+            self.embedding_cache = EmbeddingCache(
+                self.model_name,
+                self.dimension,
+                capacity=self.config.get("embedding_cache_size", 10000),
+                cache_dir=self.config.get("embedding_cache_dir")
+            )
+        self.embedding_engine = EmbeddingEngine(
+            self.model_name,
+            self.embedding_model.encode,
+            workers=self.config.get("embedding_workers", 0),
+            batch_size=self.config.get("embedding_batch_size", 32),
+            threads=self.config.get("embedding_threads", 0),
+            max_tokens=getattr(self.embedding_model, "max_seq_length", None)
+        )
+        if not self.load_index():
+            self.rerank_vectors = self._new_rerank_vectors()
+        # The first encode pays for tokenizer and kernel initialization; do it before real traffic.
+        self.embedding_model.encode(["warm-up"])
+        if self.shared_index:
+            self._stop_watching = threading.Event()
+            threading.Thread(target=self._watch, name=f"{self.name}-index-watch", daemon=True).start()
     
     async def validate(self, input_data: Dict[str, Any]) -> bool:
         required_keys = ["query", "top_k"]
-        return all(key in input_data for key in required_keys) and isinstance(input_data["top_k"], int)
+        mode = input_data.get("mode")
+        return (
+            all(key in input_data for key in required_keys)
+            and isinstance(input_data["top_k"], int)
+            and (mode is None or (mode in SEARCH_MODES and (mode == "dense" or self.lexical_enabled)))
+        )
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        query = input_data["query"]
-        top_k = input_data["top_k"]
+        if self.batcher is not None:
+            return await self.batcher.submit(input_data)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.search, input_data)
+    
+    async def search_batch_async(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.search_batch, inputs)
+    
+    def search(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.search_batch([input_data])[0]
+    
+    def search_batch(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.warm_up()
+        # Every query of every input (including extra queries such as reformulations,
+        # which are merged with reciprocal-rank fusion) is encoded in one call.
+        query_lists = [list(dict.fromkeys([item["query"]] + list(item.get("queries") or []))) for item in inputs]
+        modes = [(item.get("mode") or self.retrieval_mode) if self.lexical_index is not None else "dense" for item in inputs]
+        dense = [i for i, mode in enumerate(modes) if mode != "lexical"]
+        offsets: Dict[int, int] = {}
+        dense_queries: List[str] = []
+        for i in dense:
+            offsets[i] = len(dense_queries)
+            dense_queries.extend(query_lists[i])
         
-        query_embedding = self.embedding_model.encode([query])[0]
+        embedding_seconds = 0.0
+        if dense_queries:
+            started = time.perf_counter()
+            query_embeddings = self._index_vectors(self.encode(dense_queries))
+            embedding_seconds = time.perf_counter() - started
+            record_stage("embedding", embedding_seconds)
         
-        if self.index is None:
-            return {"error": "Index not initialized", "results": []}
+        outputs: List[Dict[str, Any]] = []
+        with self._lock.read_lock():
+            if self.index is None:
+                return [{"error": "Index not initialized", "results": []} for _ in inputs]
+            
+            # Batched stages are shared by every input in the batch.
+            seconds = [embedding_seconds if mode != "lexical" else 0.0 for mode in modes]
+            timings = [{"embedding": round(embedding_seconds * 1000, 3)} if mode != "lexical" else {} for mode in modes]
+            
+            # One index.search per distinct set of search parameters.
+            groups: Dict[Any, List[int]] = {}
+            for i in dense:
+                groups.setdefault((inputs[i].get("nprobe"), inputs[i].get("ef_search")), []).append(i)
+            
+            dense_hits: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+            inner_product = uses_inner_product(self.index)
+            rerank_vectors = self.rerank_vectors if self.rerank else None
+            for (nprobe, ef_search), members in groups.items():
+                rows = np.concatenate([np.arange(offsets[i], offsets[i] + len(query_lists[i])) for i in members])
+                fetch_k = max(self._fetch_k(inputs[i]["top_k"], len(query_lists[i]), modes[i]) for i in members)
+                started = time.perf_counter()
+                distances, labels = self.index.search(
+                    query_embeddings[rows],
+                    fetch_k * self.rerank_factor if rerank_vectors is not None else fetch_k,
+                    params=search_params(self.index, nprobe, ef_search, self._tombstone_selector)
+                )
+                indices = self._rows_for_labels(labels)
+                search_seconds = time.perf_counter() - started
+                record_stage("vector_search", search_seconds)
+                rerank_seconds = 0.0
+                if rerank_vectors is not None:
+                    started = time.perf_counter()
+                    distances, indices = exact_rerank(query_embeddings[rows], indices, rerank_vectors, fetch_k, inner_product)
+                    rerank_seconds = time.perf_counter() - started
+                    record_stage("rerank", rerank_seconds)
+                # Cosine similarity as is; squared L2 distance mapped into (0, 1].
+                scores = distances if inner_product else 1 / (1 + distances)
+                cursor = 0
+                for i in members:
+                    count = len(query_lists[i])
+                    dense_hits[i] = (scores[cursor:cursor + count], indices[cursor:cursor + count])
+                    timings[i]["vector_search"] = round(search_seconds * 1000, 3)
+                    if rerank_vectors is not None:
+                        timings[i]["rerank"] = round(rerank_seconds * 1000, 3)
+                    seconds[i] += search_seconds + rerank_seconds
+                    cursor += count
+            
+            lexical_hits: Dict[int, List[List[Tuple[int, float]]]] = {}
+            for i, mode in enumerate(modes):
+                if mode == "dense":
+                    continue
+                started = time.perf_counter()
+                lexical_hits[i] = self.lexical_index.search(
+                    query_lists[i], self._fetch_k(inputs[i]["top_k"], len(query_lists[i]), mode)
+                )
+                lexical_seconds = time.perf_counter() - started
+                record_stage("lexical_search", lexical_seconds)
+                timings[i]["lexical_search"] = round(lexical_seconds * 1000, 3)
+                seconds[i] += lexical_seconds
+            
+            for i, item in enumerate(inputs):
+                result = self._collect_results(item, query_lists[i], modes[i], dense_hits.get(i), lexical_hits.get(i))
+                outputs.append({**result, "timings": timings[i]})
+                RETRIEVAL_SECONDS.observe(seconds[i], mode=modes[i])
         
-        distances, indices = self.index.search(
-            np.array([query_embedding]).astype('float32'),
-            top_k
-        )
+        return outputs
+    
+    def _fetch_k(self, top_k: int, num_queries: int, mode: str = "dense") -> int:
+        return top_k * self.multi_query_fanout if num_queries > 1 or mode == "hybrid" else top_k
+    
+    def _collect_results(self, input_data: Dict[str, Any], queries: List[str], mode: str,
+                         dense: Optional[Tuple[np.ndarray, np.ndarray]],
+                         lexical: Optional[List[List[Tuple[int, float]]]]) -> Dict[str, Any]:
+        top_k = input_data["top_k"]
+        fetch_k = self._fetch_k(top_k, len(queries), mode)
+        dense_lists = []
+        if dense is not None:
+            scores, indices = dense
+            dense_lists = [
+                [(int(idx), float(score)) for score, idx in zip(row_s[:fetch_k], row_i[:fetch_k]) if idx != -1]
+                for row_s, row_i in zip(scores, indices)
+            ]
+        lexical_lists = lexical or []
+        scored_lists = dense_lists + lexical_lists
+        
+        if len(scored_lists) == 1:
+            hits = scored_lists[0][:top_k]
+        else:
+            weights = [self.dense_weight] * len(dense_lists) + [self.lexical_weight] * len(lexical_lists)
+            if self.hybrid_fusion == "weighted":
+                hits = weighted_score_fusion(scored_lists, weights)[:top_k]
+            else:
+                rankings = [[idx for idx, _ in scored] for scored in scored_lists]
+                hits = reciprocal_rank_fusion(rankings, k=self.rrf_k, weights=weights)[:top_k]
         
         results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if idx != -1: 
-                results.append({
-                    "document": self.documents[idx],
-                    "score": float(1 / (1 + distance)),
-                    "index": int(idx)
-                })
+        for idx, score in hits:
+            results.append({
+                "id": self.document_ids[idx],
+                "document": self.documents[idx],
+                "metadata": self.metadata[idx],
+                "score": score,
+                "index": idx
+            })
         
         return {
-            "query": query,
+            "query": input_data["query"],
+            "queries": queries,
+            "mode": mode,
             "results": results,
             "total_results": len(results)
         }
     
-    def add_documents(self, documents: List[str]) -> None:
-        if not documents:
+    def add_documents(self, documents: List[str], metadata: Optional[List[Dict[str, Any]]] = None,
+                      ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Insert or replace documents by id (default: ``document_id``). Documents whose text
+        and metadata are unchanged are skipped, so only new or edited ones are embedded.
+        """
+        if metadata is None:
+            metadata = [{} for _ in documents]
+        if ids is None:
+            ids = [document_id(text, meta) for text, meta in zip(documents, metadata)]
+        if len(metadata) != len(documents) or len(ids) != len(documents):
+            raise ValueError("metadata and ids must have one entry per document")
+        return self.ingest([(documents, metadata, ids)])
+    
+    def ingest(self, batches: Iterable[Tuple[List[str], List[Dict[str, Any]], List[str]]],
+               progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """
+        Upsert (texts, metadata, ids) batches as one change. Batches are embedded
+        ingest_chunk_size documents at a time and streamed into the index as they arrive,
+        but searches keep seeing the previous corpus until the last batch is committed;
+        if a batch fails, nothing is. ``progress`` gets the running counts after each chunk.
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        embedded = 0
+        with self._writing():
+            # Rows of this change, staged in their own stores until the commit.
+            texts_store, metadata_store, ids_store = self._new_stores()
+            staged_labels: List[np.ndarray] = []
+            staged_rows: Dict[str, int] = {}
+            superseded: List[int] = []
+            replaced = set()
+            vectors = VectorStore(self.dimension) if self.rerank_vectors is not None else None
+            first_label = self._next_label
+            with self._lock.write_lock():
+                self._ensure_writable()
+                # New vectors go into the live index under labels searches do not map yet;
+                # an empty corpus gets a private (flat) index until the commit.
+                index = self.index if self.index is not None else build_id_index(self.dimension, self.index_config)
+            
+            try:
+                for texts, metadata, ids in batches:
+                    # The last occurrence of an id wins, within a batch and across batches.
+                    latest = {doc_id: i for i, doc_id in enumerate(ids)}
+                    changed = []
+                    for doc_id, i in latest.items():
+                        row = self._row_by_id.get(doc_id)
+                        if doc_id in staged_rows:
+                            superseded.append(staged_rows[doc_id])
+                        elif row is None:
+                            counts["added"] += 1
+                        elif self.documents[row] == texts[i] and self.metadata[row] == metadata[i]:
+                            counts["unchanged"] += 1
+                            continue
+                        else:
+                            counts["updated"] += 1
+                            replaced.add(row)
+                        changed.append(i)
+                    
+                    for start in range(0, len(changed), self.ingest_chunk_size):
+                        chunk = changed[start:start + self.ingest_chunk_size]
+                        chunk_texts = [texts[i] for i in chunk]
+                        embeddings = self._index_vectors(self.encode_documents(chunk_texts))
+                        with self._lock.write_lock():
+                            labels = np.arange(self._next_label, self._next_label + len(chunk), dtype=np.int64)
+                            self._next_label += len(chunk)
+                            index.add_with_ids(embeddings, labels)
+                            self._pending_labels = (first_label, self._next_label)
+                            self._update_tombstone_selector()
+                        if vectors is not None:
+                            vectors.extend(embeddings)
+                        staged_rows.update((ids[i], len(ids_store) + offset) for offset, i in enumerate(chunk))
+                        texts_store.extend(chunk_texts)
+                        metadata_store.extend(metadata[i] for i in chunk)
+                        ids_store.extend(ids[i] for i in chunk)
+                        staged_labels.append(labels)
+                        embedded += len(chunk)
+                        if progress is not None:
+                            progress({**counts, "embedded": embedded})
+                    if progress is not None and not changed:
+                        progress({**counts, "embedded": embedded})
+                
+                labels = np.concatenate(staged_labels) if staged_labels else np.zeros(0, dtype=np.int64)
+                if superseded:
+                    keep = np.ones(len(ids_store), dtype=bool)
+                    keep[superseded] = False
+                    with self._lock.write_lock():
+                        if not remove_ids(index, labels[~keep]):
+                            self._tombstones = np.union1d(self._tombstones, labels[~keep])
+                    texts_store, metadata_store, ids_store = (
+                        store.filter(keep) for store in (texts_store, metadata_store, ids_store)
+                    )
+                    labels = labels[keep]
+                    if vectors is not None:
+                        vectors = vectors.filter(keep)
+                if not len(labels):
+                    with self._lock.write_lock():
+                        self._pending_labels = None
+                        self._update_tombstone_selector()
+                    return counts
+                
+                if self._needs_rebuild(len(self.documents) - len(replaced) + len(labels), index):
+                    # Train the configured ANN index once the corpus is large enough, from the
+                    # exact vectors when they are kept, else from the flat fallback index.
+                    if vectors is not None:
+                        index_labels = np.concatenate([self.labels, labels])
+                        index_vectors = np.vstack([self.rerank_vectors[:], vectors[:]])
+                    else:
+                        index_labels, index_vectors = reconstruct_with_ids(index)
+                    index = build_id_index(self.dimension, self.index_config, index_vectors)
+                    index.add_with_ids(index_vectors, index_labels)
+                # Built outside the write lock; searches keep using the current index meanwhile.
+                lexical_index = None
+                if self.lexical_index is not None:
+                    lexical_index = self.lexical_index.remove(sorted(replaced)).extend(texts_store)
+            except BaseException:
+                with self._lock.write_lock():
+                    added = np.arange(first_label, self._next_label, dtype=np.int64)
+                    # Streamed into the live index unless it was empty, even if a rebuild has
+                    # since replaced the local ``index``.
+                    if self.index is not None and len(added) and not remove_ids(self.index, added):
+                        self._tombstones = np.union1d(self._tombstones, added)
+                    self._pending_labels = None
+                    self._update_tombstone_selector()
+                raise
+            
+            with self._lock.write_lock():
+                # The index to publish is in memory: the live one made writable or a new build.
+                self.index = index
+                self._index_mmapped = False
+                self._pending_labels = None
+                if vectors is not None:
+                    self.rerank_vectors.extend(vectors[:])
+                self.documents.extend(texts_store)
+                self.metadata.extend(metadata_store)
+                self.document_ids.extend(ids_store)
+                self.labels = np.concatenate([self.labels, labels])
+                # After appending, so a rebuild triggered by the drop keeps the new rows.
+                self._drop_rows(sorted(replaced))
+                self._update_tombstone_selector()
+                self.lexical_index = lexical_index
+                self._reindex()
+                self.corpus_version += 1
+            self._persist()
+        return counts
+    
+    def delete_documents(self, ids: Optional[Iterable[str]] = None, sources: Optional[Iterable[str]] = None) -> int:
+        """Delete documents by id and/or by ``metadata["source"]``; returns how many were removed."""
+        with self._writing():
+            rows = {self._row_by_id[doc_id] for doc_id in ids or () if doc_id in self._row_by_id}
+            if sources:
+                sources = set(sources)
+                rows.update(row for row, meta in enumerate(self.metadata) if meta.get("source") in sources)
+            if not rows:
+                return 0
+            rows = sorted(rows)
+            lexical_index = self.lexical_index.remove(rows) if self.lexical_index is not None else None
+            
+            with self._lock.write_lock():
+                self._ensure_writable()
+                self._drop_rows(rows)
+                self.lexical_index = lexical_index
+                self._reindex()
+                self.corpus_version += 1
+            self._persist()
+            return len(rows)
+    
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        self.warm_up()
+        with self._lock.read_lock():
+            row = self._row_by_id.get(doc_id)
+            if row is None:
+                return None
+            return {"id": doc_id, "document": self.documents[row], "metadata": self.metadata[row]}
+    
+    def _drop_rows(self, rows: List[int]) -> None:
+        # Caller holds the write lock and has called _ensure_writable.
+        if not rows:
             return
-        
-        embeddings = self.embedding_model.encode(documents)
-        
-        if self.index is None:
-            self.index = faiss.IndexFlatL2(self.dimension)
-
-        self.index.add(np.array(embeddings).astype('float32'))
-        self.documents.extend(documents)
+        keep = np.ones(len(self.documents), dtype=bool)
+        keep[rows] = False
+        dead = self.labels[~keep]
+        labels = self.labels[keep]
+        # Build the new state first, so a failure part way leaves the old one intact.
+        rerank_vectors = self.rerank_vectors.filter(keep) if self.rerank_vectors is not None else None
+        documents = self.documents.filter(keep)
+        metadata = self.metadata.filter(keep)
+        document_ids = self.document_ids.filter(keep)
+        index, tombstones = self.index, self._tombstones
+        if not remove_ids(index, dead):
+            tombstones = np.union1d(tombstones, dead)
+            if len(tombstones) > self.tombstone_ratio * index.ntotal:
+                stored = (labels, rerank_vectors[:]) if rerank_vectors is not None else None
+                index = rebuild_with_ids(index, labels, stored)
+                tombstones = np.zeros(0, dtype=np.int64)
+        self.index, self._tombstones = index, tombstones
+        self.rerank_vectors = rerank_vectors
+        self.documents, self.metadata, self.document_ids = documents, metadata, document_ids
+        self.labels = labels
+        self._update_tombstone_selector()
+    
+    def _update_tombstone_selector(self) -> None:
+        self._tombstone_selector = self._selector_excluding(self._tombstones, self._pending_labels)
+    
+    @staticmethod
+    def _selector_excluding(labels: np.ndarray, label_range: Optional[Tuple[int, int]] = None) -> Any:
+        excluded = []
+        if len(labels):
+            excluded.append(faiss.IDSelectorBatch(labels))
+        if label_range is not None:
+            excluded.append(faiss.IDSelectorRange(*label_range))
+        if not excluded:
+            return None
+        either = excluded[0] if len(excluded) == 1 else faiss.IDSelectorOr(*excluded)
+        selector = faiss.IDSelectorNot(either)
+        selector.referenced_objects = excluded + [either]
+        return selector
     
+    def _reindex(self) -> None:
+        self._row_by_id, self._row_by_label = self._build_maps(self.document_ids, self.labels, self._next_label)
+    
+    @staticmethod
+    def _build_maps(document_ids: Iterable[str], labels: np.ndarray, next_label: int) -> Tuple[Dict[str, int], np.ndarray]:
+        row_by_id = {doc_id: row for row, doc_id in enumerate(document_ids)}
+        row_by_label = np.full(next_label, -1, dtype=np.int64)
+        row_by_label[labels] = np.arange(len(labels))
+        return row_by_id, row_by_label
+    
+    def _rows_for_labels(self, labels: np.ndarray) -> np.ndarray:
+        rows = np.full(labels.shape, -1, dtype=np.int64)
+        valid = (labels >= 0) & (labels < len(self._row_by_label))
+        rows[valid] = self._row_by_label[labels[valid]]
+        return rows
+    
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.encode, texts)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.warm_up()
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self.embedding_model.encode)
+        return np.array(self.embedding_model.encode(texts)).astype('float32')
+    
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Bulk counterpart of ``encode`` for ingestion, through the embedding engine."""
+        self.warm_up()
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self.embedding_engine.encode)
+        return self.embedding_engine.encode(texts)
+
+    def _needs_rebuild(self, total_documents: int, index: Any) -> bool:
+        return (
+            index_kind(index) == "flat"
+            and (self.index_config["index_type"] != "flat"
+                 or index_storage(index) != self.index_config["vector_storage"])
+            and total_documents >= min_train_size(self.index_config, total_documents)
+        )
+
+    def _index_vectors(self, embeddings: np.ndarray) -> np.ndarray:
+        if self.index_config["metric"] != "cosine":
+            return embeddings
+        vectors = np.array(embeddings, dtype="float32")
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _new_rerank_vectors(self) -> Optional[VectorStore]:
+        return VectorStore(self.dimension) if self.rerank else None
+
     def clear_index(self) -> None:
-        self.index = None
-        self.documents = []
+        with self._writing():
+            with self._lock.write_lock():
+                self.index = None
+                self.documents, self.metadata, self.document_ids = self._new_stores()
+                self.labels = np.zeros(0, dtype=np.int64)
+                self.rerank_vectors = self._new_rerank_vectors()
+                self._next_label = 0
+                self._tombstones = np.zeros(0, dtype=np.int64)
+                self._update_tombstone_selector()
+                self._reindex()
+                self.lexical_index = self._new_lexical_index()
+                self._index_mmapped = False
+                self.corpus_version += 1
+            self._persist()
+
+    def save_index(self) -> Optional[int]:
+        if self.snapshot_store is None:
+            return None
+        with self._writing():
+            return self._save_snapshot()
+
+    def _save_snapshot(self) -> int:
+        with self._write_mutex:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self.generation = self.snapshot_store.save(
+                self.index,
+                self.documents,
+                self.metadata,
+                info={
+                    "model_name": self.model_name,
+                    "dimension": self.dimension,
+                    "metric": self.index_config["metric"],
+                    "next_label": self._next_label
+                },
+                lexical_index=self.lexical_index,
+                document_ids=self.document_ids,
+                labels=self.labels,
+                vectors=self.rerank_vectors
+            )
+            if self.use_mmap and self.rerank_vectors is not None and not self.shared_index:
+                # Re-ranking reads a few rows per query; serve them from the file just written.
+                self.rerank_vectors = self.snapshot_store.load_vectors(self.generation)
+            return self.generation
+
+    def load_index(self) -> bool:
+        if self.snapshot_store is None:
+            return False
+        with self._write_mutex:
+            snapshot = self.snapshot_store.load(mmap=self.use_mmap)
+            if snapshot is None:
+                return False
+            stored_model = snapshot["manifest"]["info"].get("model_name")
+            if stored_model and stored_model != self.model_name:
+                raise ValueError(
+                    f"Snapshot at {snapshot['path']} was built with {stored_model}, not {self.model_name}"
+                )
+            stored_metric = snapshot["manifest"]["info"].get("metric", "l2")
+            if stored_metric != self.index_config["metric"]:
+                raise ValueError(
+                    f"Snapshot at {snapshot['path']} uses the {stored_metric} metric, not {self.index_config['metric']}"
+                )
+            lexical_index = None
+            if self.lexical_enabled:
+                # Snapshots written before the lexical index existed are indexed on load.
+                lexical_index = snapshot["lexical_index"] or self._new_lexical_index().extend(list(snapshot["documents"]))
+            index, index_mmapped = snapshot["index"], self.use_mmap and snapshot["index"] is not None
+            document_ids, labels = snapshot["document_ids"], snapshot["labels"]
+            if document_ids is None:
+                # Snapshots written before stable ids: rows were addressed by FAISS position.
+                document_ids = DocumentStore(self._legacy_ids(snapshot["documents"], snapshot["document_metadata"]))
+                labels = np.arange(len(document_ids), dtype=np.int64)
+                if index is not None and not is_id_mapped(index):
+                    index, index_mmapped = rebuild_with_ids(index), False
+            labels = np.asarray(labels, dtype=np.int64)
+            stored = index_ids(index) if index is not None and index_kind(index) == "hnsw" else np.zeros(0, dtype=np.int64)
+            next_label = max(
+                snapshot["manifest"]["info"].get("next_label", 0),
+                int(labels.max()) + 1 if len(labels) else 0,
+                int(stored.max()) + 1 if len(stored) else 0
+            )
+            tombstones = np.setdiff1d(stored, labels)
+            row_by_id, row_by_label = self._build_maps(document_ids, labels, next_label)
+            rerank_vectors = self._load_rerank_vectors(snapshot["vectors"], index, labels)
+            # Everything is prepared above; the swap itself only waits for in-flight searches.
+            with self._lock.write_lock():
+                self.index = index
+                self.documents = snapshot["documents"]
+                self.metadata = snapshot["document_metadata"]
+                self.document_ids = document_ids
+                self.labels = labels
+                self.rerank_vectors = rerank_vectors
+                self._next_label = next_label
+                self._tombstones = tombstones
+                self._tombstone_selector = self._selector_excluding(tombstones)
+                self._row_by_id, self._row_by_label = row_by_id, row_by_label
+                self.lexical_index = lexical_index
+                self.generation = snapshot["generation"]
+                self._index_path = snapshot["index_path"]
+                self._index_mmapped = index_mmapped
+                self.corpus_version += 1
+            return True
+
+    def refresh(self) -> bool:
+        """Switch to the snapshot store's current generation if another process published a newer one."""
+        if self.snapshot_store is None:
+            return False
+        generation = self.snapshot_store.current_generation()
+        if generation is None or generation == self.generation:
+            return False
+        with self._write_mutex:
+            if self.snapshot_store.current_generation() == self.generation:
+                return False
+            return self.load_index()
+
+    def _watch(self) -> None:
+        while not self._stop_watching.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # E.g. the generation was pruned while loading; the next poll picks up the newer one.
+                logger.exception("Failed to load index generation from %s", self.snapshot_store.root)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        self.warm_up()
+        with self._write_mutex:
+            if not self.shared_index:
+                yield
+                return
+            with self.snapshot_store.writer_lock():
+                # Apply the change on top of whatever another worker last published.
+                self.refresh()
+                generation = self.generation
+                yield
+                if self.generation != generation:
+                    # Serve the generation just written from the mapped files, like every other worker.
+                    self.load_index()
+
+    def _load_rerank_vectors(self, vectors: Optional[VectorStore], index: Any,
+                             labels: np.ndarray) -> Optional[VectorStore]:
+        if not self.rerank or vectors is not None:
+            return vectors if self.rerank else None
+        if index is None:
+            return self._new_rerank_vectors()
+        # Snapshot saved without re-rank vectors: decode them from the index, in row order.
+        try:
+            ids, decoded = reconstruct_with_ids(index)
+        except ValueError:
+            logger.warning("Snapshot has no re-rank vectors and an IVF index cannot rebuild them; "
+                           "re-ranking is off until the index is cleared and re-ingested")
+            return None
+        order = np.argsort(ids)
+        return VectorStore(index.d, decoded[order[np.searchsorted(ids, labels, sorter=order)]])
+
+    @staticmethod
+    def _legacy_ids(documents: Iterable[str], document_metadata: Iterable[Dict[str, Any]]) -> List[str]:
+        ids, seen = [], set()
+        for row, (text, meta) in enumerate(zip(documents, document_metadata)):
+            doc_id = document_id(text, meta)
+            # Older corpora may hold the same text twice; keep every row addressable.
+            if doc_id in seen:
+                doc_id = f"{doc_id}@{row}"
+            seen.add(doc_id)
+            ids.append(doc_id)
+        return ids
+
+    def _new_stores(self) -> Tuple[DocumentStore, DocumentStore, DocumentStore]:
+        options = {"compression": self.document_compression, "block_size": self.document_block_size}
+        return DocumentStore(**options), json_store(**options), DocumentStore()
+
+    def _new_lexical_index(self) -> Optional[BM25Index]:
+        if not self.lexical_enabled:
+            return None
+        return BM25Index(k1=self.config.get("bm25_k1", 1.2), b=self.config.get("bm25_b", 0.75))
+
+    def _ensure_writable(self) -> None:
+        # Memory-mapped snapshots are read-only; copy the index into RAM before mutating.
+        # Document stores copy themselves on their first write.
+        if self._index_mmapped:
+            self.index = faiss.read_index(self._index_path)
+            self._index_mmapped = False
+
+    def _persist(self) -> None:
+        if not self.auto_save or self.snapshot_store is None:
+            return
+        if self.save_interval <= 0:
+            self._save_snapshot()
+            return
+        with self._write_mutex:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_interval, self.flush_index)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush_index(self) -> Optional[int]:
+        """Write the snapshot deferred by ``save_interval_seconds`` now, if one is pending."""
+        with self._write_mutex:
+            if self._save_timer is None:
+                return None
+            return self._save_snapshot()
     
     def get_index_stats(self) -> Dict[str, Any]:
         return {
             "total_documents": len(self.documents),
             "dimension": self.dimension,
-            "index_type": "FAISS FlatL2" if self.index else "Not initialized"
-        } 
\ No newline at end of file
+            "index_type": describe_index(self.index),
+            "deleted_pending_compaction": len(self._tombstones),
+            "configured_index_type": self.index_config["index_type"],
+            "vector_storage": index_storage(self.index),
+            "metric": self.index_config["metric"],
+            "rerank": self.rerank and self.rerank_vectors is not None,
+            "retrieval_mode": self.retrieval_mode,
+            "lexical_index": self.lexical_index.get_stats() if self.lexical_index is not None else None,
+            "memory": {
+                "vector_bytes": index_bytes(self.index),
+                "rerank_vector_bytes": self.rerank_vectors.nbytes if self.rerank_vectors is not None else 0,
+                "rerank_vectors_mmapped": self.rerank_vectors.mmapped if self.rerank_vectors is not None else False,
+                "text_bytes": self.documents.nbytes,
+                "text_uncompressed_bytes": self.documents.raw_bytes,
+                "metadata_bytes": self.metadata.nbytes,
+                "id_bytes": self.document_ids.nbytes + self.labels.nbytes,
+                "document_compression": self.documents.compression,
+            },
+            "generation": self.generation,
+            "shared_index": self.shared_index,
+            "persistent": self.snapshot_store is not None,
+            "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+            "embedding_engine": self.embedding_engine.get_stats() if self.embedding_engine else None,
+            "micro_batching": self.batcher.get_stats() if self.batcher else None
+        }
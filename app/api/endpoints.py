@@ -1,11 +1,20 @@
-from typing import Dict, List, Optional
-from fastapi import APIRouter, HTTPException
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import json
+import logging
 import uuid
+from app.core.ingestion import JobQueueFull, UploadTooLarge
+from app.core.metrics import REGISTRY
 from app.core.orchestrator import AgentOrchestrator
+from app.config import AGENT_CONFIG
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-orchestrator = AgentOrchestrator()
+orchestrator = AgentOrchestrator(AGENT_CONFIG)
 
 class ResponseMessage(BaseModel):
     content: str
@@ -15,13 +24,35 @@ class ResponseMessage(BaseModel):
 class RequestQuery(BaseModel):
     id: str
     content: str
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    # dense, lexical (BM25) or hybrid; defaults to RETRIEVAL_AGENT_MODE
+    mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    include_timings: bool = False
+    # Overrides QUERY_DEADLINE_SECONDS for this request; 0 = no deadline
+    deadline_ms: Optional[int] = None
+
+    def deadline_seconds(self) -> Optional[float]:
+        return self.deadline_ms / 1000 if self.deadline_ms is not None else None
 
 class ResponseQuery(BaseModel):
     id: str
     message: ResponseMessage
+    # Optional stages (query_analysis, reformulation, quality_scoring) skipped to meet the deadline or under load
+    skipped_stages: List[str] = []
+    # Per-stage latencies in milliseconds, only when include_timings is set
+    timings: Optional[Dict[str, float]] = None
+    # Passages deduplicated / dropped and estimated tokens saved by context packing
+    context_packing: Optional[Dict[str, Any]] = None
 
 class DocumentRequest(BaseModel):
-    documents: List[str]
+    # Plain strings, or {"id": ..., "text": ..., "metadata": {...}} chunks from ingest_docs.py.
+    # Documents are upserted by id (default: "<source>#<chunk>", else a hash of the text).
+    documents: List[Union[str, Dict[str, Any]]]
+
+class DeleteDocumentsRequest(BaseModel):
+    ids: List[str] = []
+    sources: List[str] = []
 
 class QueryResponse(BaseModel):
     query_analysis: Dict
@@ -29,17 +60,27 @@ class QueryResponse(BaseModel):
     response: Dict
     status: str
 
-class QueryRequest(BaseModel):
-    id: str
-    content: str
+class BatchQueryRequest(BaseModel):
+    queries: List[RequestQuery]
+    top_k: int = 3
+    concurrency: Optional[int] = None
+    include_analysis: bool = False
+    stream: bool = False
+    mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
 
-@router.post("/query", response_model=ResponseQuery)
+@router.post("/query", response_model=ResponseQuery, response_model_exclude_none=True)
 async def answer_query(item: RequestQuery) -> ResponseQuery:
     try:
-        result = await orchestrator.process_query(item.content, top_k=3)
-        print("Orchestrator result:", result)
+        search_params = {"nprobe": item.nprobe, "ef_search": item.ef_search, "mode": item.mode}
+        result = await orchestrator.process_query(item.content, top_k=3, search_params=search_params,
+                                                  deadline_seconds=item.deadline_seconds())
+        logger.debug("Orchestrator result: %s", result)
+        if result.get("deadline_exceeded"):
+            raise HTTPException(status_code=504, detail=result.get("error", "Request deadline exceeded"))
         if result.get("status") == "error":
-            raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+            # Quota or overload errors that outlasted the retries are worth retrying later.
+            raise HTTPException(status_code=503 if result.get("retryable") else 500,
+                                detail=result.get("error", "Unknown error"))
         generated_response = result.get("response", {}).get("response")
         if not generated_response:
             generated_response = "No response generated. Please check if documents are ingested and context is available."
@@ -48,28 +89,174 @@ async def answer_query(item: RequestQuery) -> ResponseQuery:
             message=ResponseMessage(
                 content=generated_response,
                 type=1,
-                id=str(uuid.uuid4()),
+                id=result.get("response", {}).get("response_id") or str(uuid.uuid4()),
             ),
+            skipped_stages=result.get("skipped_stages", []),
+            timings=result.get("timings") if item.include_timings else None,
+            context_packing=result.get("response", {}).get("context_packing"),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/query/stream")
+async def stream_query(item: RequestQuery) -> StreamingResponse:
+    search_params = {"nprobe": item.nprobe, "ef_search": item.ef_search, "mode": item.mode}
+    
+    async def event_stream():
+        async for event in orchestrator.stream_query(item.content, top_k=3, search_params=search_params,
+                                                     deadline_seconds=item.deadline_seconds()):
+            yield f"event: {event['event']}\ndata: {json.dumps({'id': item.id, **event['data']})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _batch_item(request: BatchQueryRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    item = {"id": request.queries[result["index"]].id, "index": result["index"], "status": result["status"]}
+    if result["status"] != "success":
+        item["error"] = result.get("error", "Unknown error")
+        return item
+    response = result.get("response", {})
+    item["message"] = {
+        "content": response.get("response") or "No response generated. Please check if documents are ingested and context is available.",
+        "type": 1,
+        "id": response.get("response_id") or str(uuid.uuid4()),
+    }
+    if request.include_analysis:
+        item["query_analysis"] = result.get("query_analysis")
+    item["skipped_stages"] = result.get("skipped_stages", [])
+    return item
+
+@router.post("/query/batch")
+async def batch_query(request: BatchQueryRequest):
+    queries = [item.content for item in request.queries]
+    if request.stream:
+        async def ndjson_stream():
+            async for result in orchestrator.stream_batch(
+                queries, top_k=request.top_k, search_params={"mode": request.mode}, concurrency=request.concurrency,
+                include_analysis=request.include_analysis
+            ):
+                yield json.dumps(_batch_item(request, result)) + "\n"
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    try:
+        results = await orchestrator.process_batch(
+            queries, top_k=request.top_k, search_params={"mode": request.mode}, concurrency=request.concurrency,
+            include_analysis=request.include_analysis
         )
+        return {"results": [_batch_item(request, result) for result in results]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/responses/{response_id}/quality")
+async def get_response_quality(response_id: str):
+    quality = orchestrator.get_quality(response_id)
+    if quality is None:
+        raise HTTPException(status_code=404, detail=f"No quality analysis for response {response_id}")
+    return quality
+
 @router.post("/documents")
 async def add_documents(request: DocumentRequest):
     try:
-        orchestrator.add_documents(request.documents)
+        counts = await run_in_threadpool(orchestrator.add_documents, request.documents)
         return {
             "status": "success",
             "message": "Documents added successfully",
-            "documents_added": len(request.documents)
+            "documents_added": counts["added"],
+            "documents_updated": counts["updated"],
+            "documents_unchanged": counts["unchanged"]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _read_upload(upload: Any, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+@router.post("/documents/jobs", status_code=202)
+async def create_ingestion_job(request: Request):
+    """
+    Start a background ingestion job from an NDJSON body (one document per line, as written
+    by ``ingest_docs.py --output *.jsonl``) or a multipart file upload of the same format.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = next((value for value in form.values() if hasattr(value, "read")), None)
+            if upload is None:
+                raise HTTPException(status_code=400, detail="Multipart uploads need a file field")
+            job = await orchestrator.ingestion.receive(_read_upload(upload))
+        else:
+            job = await orchestrator.ingestion.receive(request.stream())
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return job.to_dict()
+
+@router.get("/documents/jobs")
+async def list_ingestion_jobs():
+    return {"jobs": [job.to_dict() for job in orchestrator.ingestion.list_jobs()]}
+
+@router.get("/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    job = orchestrator.ingestion.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No ingestion job {job_id}")
+    return job.to_dict()
+
+@router.delete("/documents/jobs/{job_id}")
+async def cancel_ingestion_job(job_id: str):
+    job = orchestrator.ingestion.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No ingestion job {job_id}")
+    return job.to_dict()
+
+@router.post("/documents/delete")
+async def delete_documents(request: DeleteDocumentsRequest):
+    try:
+        deleted = await run_in_threadpool(orchestrator.delete_documents, request.ids, request.sources)
+        return {
+            "status": "success",
+            "documents_deleted": deleted
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Ids go in the query string: the default "<source>#<chunk>" ids would be a URL fragment in a
+# path, and ids starting with "jobs/" would collide with the routes above.
+@router.get("/documents/by-id")
+async def get_document(id: str):
+    document = orchestrator.get_document(id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No document with id {id}")
+    return document
+
+@router.delete("/documents/by-id")
+async def delete_document(id: str):
+    try:
+        deleted = await run_in_threadpool(orchestrator.delete_documents, [id])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No document with id {id}")
+    return {
+        "status": "success",
+        "documents_deleted": deleted
+    }
+
 @router.delete("/documents")
 async def clear_documents():
     try:
-        orchestrator.clear_documents()
+        await run_in_threadpool(orchestrator.clear_index)
         return {
             "status": "success",
             "message": "All documents cleared"
@@ -77,6 +264,25 @@ async def clear_documents():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/index/save")
+async def save_index():
+    try:
+        generation = await run_in_threadpool(orchestrator.save_index)
+        if generation is None:
+            raise HTTPException(status_code=400, detail="Index persistence is not configured")
+        return {
+            "status": "success",
+            "generation": generation
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/status")
 async def get_status():
     try:
@@ -84,14 +290,3 @@ async def get_status():
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-@router.post("/query")
-async def process_query(request: QueryRequest):
-    try:
-        response = orchestrator.process_query(request.id, request.content)
-        return {
-            "id": request.id,
-            "message": response
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
@@ -1,36 +1,129 @@
+import logging
 import os
 from typing import Dict, Any
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 env_path = os.path.join(os.path.dirname(__file__), '.env')
-print(f"Loading .env from: {env_path}")
+logger.info("Loading .env from: %s", env_path)
 load_dotenv(env_path)
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-print(f"GOOGLE_API_KEY loaded: {'Yes' if GOOGLE_API_KEY else 'No'}")
+logger.info("GOOGLE_API_KEY loaded: %s", "Yes" if GOOGLE_API_KEY else "No")
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+# Load models and indexes in a background thread as soon as the server starts (otherwise on first use)
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "True").lower() == "true"
 
 AGENT_CONFIG: Dict[str, Any] = {
+    "llm": {
+        "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        "requests_per_minute": float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+        "burst": int(os.getenv("LLM_BURST", "0")) or None,
+        "timeout_seconds": float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "3")),
+        "backoff_base_seconds": float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5")),
+        "backoff_max_seconds": float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8")),
+        "coalesce": os.getenv("LLM_COALESCE", "True").lower() == "true"
+    },
     "query_agent": {
         "model": os.getenv("QUERY_AGENT_MODEL", "gemini-2.0-flash"),
-        "max_tokens": int(os.getenv("QUERY_AGENT_MAX_TOKENS", "150")),
-        "temperature": float(os.getenv("QUERY_AGENT_TEMPERATURE", "0.7"))
+        "max_tokens": int(os.getenv("QUERY_AGENT_MAX_TOKENS", "300")),
+        "temperature": float(os.getenv("QUERY_AGENT_TEMPERATURE", "0.7")),
+        "max_reformulations": int(os.getenv("QUERY_AGENT_MAX_REFORMULATIONS", "3"))
     },
     "retrieval_agent": {
         "model_name": os.getenv("RETRIEVAL_AGENT_MODEL", "all-MiniLM-L6-v2"),
-        "top_k": int(os.getenv("RETRIEVAL_AGENT_TOP_K", "3"))
+        "top_k": int(os.getenv("RETRIEVAL_AGENT_TOP_K", "3")),
+        "index_dir": os.getenv("RETRIEVAL_AGENT_INDEX_DIR"),
+        "auto_save": os.getenv("RETRIEVAL_AGENT_AUTO_SAVE", "True").lower() == "true",
+        "save_interval_seconds": float(os.getenv("RETRIEVAL_AGENT_SAVE_INTERVAL_SECONDS", "0")),
+        "mmap": os.getenv("RETRIEVAL_AGENT_MMAP", "True").lower() == "true",
+        "keep_generations": int(os.getenv("RETRIEVAL_AGENT_KEEP_GENERATIONS", "2")),
+        "shared_index": os.getenv("RETRIEVAL_AGENT_SHARED_INDEX", "False").lower() == "true",
+        "refresh_interval_seconds": float(os.getenv("RETRIEVAL_AGENT_REFRESH_INTERVAL_SECONDS", "1.0")),
+        "document_compression": os.getenv("RETRIEVAL_AGENT_DOCUMENT_COMPRESSION", "none"),
+        "document_block_size": int(os.getenv("RETRIEVAL_AGENT_DOCUMENT_BLOCK_SIZE", "65536")),
+        "index_type": os.getenv("RETRIEVAL_AGENT_INDEX_TYPE", "flat"),
+        "nlist": int(os.getenv("RETRIEVAL_AGENT_NLIST", "0")),
+        "nprobe": int(os.getenv("RETRIEVAL_AGENT_NPROBE", "8")),
+        "pq_m": int(os.getenv("RETRIEVAL_AGENT_PQ_M", "48")),
+        "pq_nbits": int(os.getenv("RETRIEVAL_AGENT_PQ_NBITS", "8")),
+        "hnsw_m": int(os.getenv("RETRIEVAL_AGENT_HNSW_M", "32")),
+        "ef_construction": int(os.getenv("RETRIEVAL_AGENT_EF_CONSTRUCTION", "200")),
+        "ef_search": int(os.getenv("RETRIEVAL_AGENT_EF_SEARCH", "64")),
+        "min_ann_documents": int(os.getenv("RETRIEVAL_AGENT_MIN_ANN_DOCUMENTS", "1000")),
+        "tombstone_ratio": float(os.getenv("RETRIEVAL_AGENT_TOMBSTONE_RATIO", "0.2")),
+        "vector_storage": os.getenv("RETRIEVAL_AGENT_VECTOR_STORAGE", "float32"),
+        "metric": os.getenv("RETRIEVAL_AGENT_METRIC", "l2"),
+        "rerank": os.getenv("RETRIEVAL_AGENT_RERANK", "False").lower() == "true",
+        "rerank_factor": int(os.getenv("RETRIEVAL_AGENT_RERANK_FACTOR", "4")),
+        "embedding_cache_size": int(os.getenv("RETRIEVAL_AGENT_EMBEDDING_CACHE_SIZE", "10000")),
+        "embedding_cache_dir": os.getenv("RETRIEVAL_AGENT_EMBEDDING_CACHE_DIR"),
+        "embedding_workers": int(os.getenv("RETRIEVAL_AGENT_EMBEDDING_WORKERS", "0")),
+        "embedding_batch_size": int(os.getenv("RETRIEVAL_AGENT_EMBEDDING_BATCH_SIZE", "32")),
+        "embedding_threads": int(os.getenv("RETRIEVAL_AGENT_EMBEDDING_THREADS", "0")),
+        "ingest_chunk_size": int(os.getenv("RETRIEVAL_AGENT_INGEST_CHUNK_SIZE", "2048")),
+        "multi_query": os.getenv("RETRIEVAL_AGENT_MULTI_QUERY", "False").lower() == "true",
+        "multi_query_fanout": int(os.getenv("RETRIEVAL_AGENT_MULTI_QUERY_FANOUT", "2")),
+        "rrf_k": int(os.getenv("RETRIEVAL_AGENT_RRF_K", "60")),
+        "lexical_index": os.getenv("RETRIEVAL_AGENT_LEXICAL_INDEX", "True").lower() == "true",
+        "retrieval_mode": os.getenv("RETRIEVAL_AGENT_MODE", "dense"),
+        "hybrid_fusion": os.getenv("RETRIEVAL_AGENT_HYBRID_FUSION", "rrf"),
+        "dense_weight": float(os.getenv("RETRIEVAL_AGENT_DENSE_WEIGHT", "1.0")),
+        "lexical_weight": float(os.getenv("RETRIEVAL_AGENT_LEXICAL_WEIGHT", "1.0")),
+        "bm25_k1": float(os.getenv("RETRIEVAL_AGENT_BM25_K1", "1.2")),
+        "bm25_b": float(os.getenv("RETRIEVAL_AGENT_BM25_B", "0.75")),
+        "search_workers": int(os.getenv("RETRIEVAL_AGENT_SEARCH_WORKERS", "4")),
+        "micro_batching": os.getenv("RETRIEVAL_AGENT_MICRO_BATCHING", "True").lower() == "true",
+        "max_batch_size": int(os.getenv("RETRIEVAL_AGENT_MAX_BATCH_SIZE", "32")),
+        "batch_window_ms": float(os.getenv("RETRIEVAL_AGENT_BATCH_WINDOW_MS", "2"))
     },
     "response_agent": {
         "model": os.getenv("RESPONSE_AGENT_MODEL", "gemini-2.0-flash"),
         "max_tokens": int(os.getenv("RESPONSE_AGENT_MAX_TOKENS", "500")),
         "temperature": float(os.getenv("RESPONSE_AGENT_TEMPERATURE", "0.7")),
+        "quality_analysis": os.getenv("RESPONSE_AGENT_QUALITY_ANALYSIS", "background"),
+        "quality_results_max": int(os.getenv("RESPONSE_AGENT_QUALITY_RESULTS_MAX", "1000")),
         "system_prompt": """You are an expert FAQ response generator. 
         Generate clear, concise, and accurate responses based on the provided context.
         Focus on being helpful, accurate, and maintaining a professional tone."""
+    },
+    "context": {
+        "enabled": os.getenv("CONTEXT_PACKING_ENABLED", "True").lower() == "true",
+        "token_budget": int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+        # Per-model overrides, e.g. "gemini-2.0-flash=4000,gemini-1.5-pro=8000"
+        "model_budgets": os.getenv("CONTEXT_MODEL_BUDGETS", ""),
+        "dedup_threshold": float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95")),
+        "mmr_lambda": float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+    },
+    "semantic_cache": {
+        "enabled": os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true",
+        "threshold": float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        "ttl_seconds": float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")),
+        "max_entries": int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    },
+    "batch": {
+        "concurrency": int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+    },
+    "ingestion": {
+        "spool_dir": os.getenv("INGEST_SPOOL_DIR") or None,
+        "batch_size": int(os.getenv("INGEST_BATCH_SIZE", "256")),
+        "max_queued_jobs": int(os.getenv("INGEST_MAX_QUEUED_JOBS", "4")),
+        "max_upload_bytes": int(os.getenv("INGEST_MAX_UPLOAD_BYTES", "0")),
+        "keep_jobs": int(os.getenv("INGEST_KEEP_JOBS", "100"))
+    },
+    "degradation": {
+        # Default per-request deadline for /query and /query/stream; 0 = none
+        "deadline_seconds": float(os.getenv("QUERY_DEADLINE_SECONDS", "30")),
+        # Skip optional stages (query analysis, reformulation, quality scoring) under load or deadline pressure
+        "enabled": os.getenv("DEGRADATION_ENABLED", "True").lower() == "true",
+        "max_in_flight": int(os.getenv("DEGRADATION_MAX_IN_FLIGHT", "32")),
+        "safety_factor": float(os.getenv("DEGRADATION_SAFETY_FACTOR", "1.5"))
     }
 }
\ No newline at end of file
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent ``submit`` calls into batches.
+
+    Items arriving within ``max_wait_ms`` of the first queued item (or until
+    ``max_batch_size`` items are queued) are passed to ``handler`` in one call on
+    ``executor``; each caller receives the result at its own position. If a batch
+    fails, its items are retried one by one so one bad item does not fail the rest.
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0, executor: Optional[Executor] = None, history: int = 2048):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self._queue: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.items = 0
+        self._batch_sizes: Counter = Counter()
+        self._queue_delays: Deque[float] = deque(maxlen=history)
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future, time.perf_counter()))
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch_size], self._queue[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.batches += 1
+        self.items += len(batch)
+        self._batch_sizes[len(batch)] += 1
+        self._queue_delays.extend(started - queued_at for _, _, queued_at in batch)
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, self.handler, items)
+            outcomes = [(result, None) for result in results]
+        except Exception as e:
+            if len(batch) == 1:
+                outcomes = [(None, e)]
+            else:
+                outcomes = []
+                for item in items:
+                    try:
+                        outcomes.append(((await loop.run_in_executor(self.executor, self.handler, [item]))[0], None))
+                    except Exception as item_error:
+                        outcomes.append((None, item_error))
+
+        for (_, future, _), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        delays_ms = np.array(self._queue_delays) * 1000 if self._queue_delays else np.zeros(1)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "batch_size_distribution": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            "queue_delay_ms": {
+                "mean": round(float(delays_ms.mean()), 3),
+                "p50": round(float(np.percentile(delays_ms, 50)), 3),
+                "p99": round(float(np.percentile(delays_ms, 99)), 3),
+            },
+        }
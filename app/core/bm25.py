@@ -0,0 +1,193 @@
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Keeps CLI flags, config keys and dotted/underscored identifiers as single tokens
+# (``--peer.address``, ``CORE_PEER_TLS_ENABLED``, ``GetState``, ``core.yaml``).
+TOKEN_PATTERN = re.compile(r"-{0,2}[A-Za-z0-9_][A-Za-z0-9_.:/\-]*")
+SUBTOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+TERMS_FILE = "terms.json"
+OFFSETS_FILE = "offsets.npy"
+DOC_IDS_FILE = "doc_ids.npy"
+TFS_FILE = "tfs.npy"
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+PARAMS_FILE = "params.json"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens; compound identifiers also contribute their parts."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        raw = match.group(0).rstrip(".:/-")
+        if not raw.strip("-"):
+            continue
+        tokens.append(raw.lower())
+        parts = SUBTOKEN_PATTERN.findall(raw)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index stored as CSR arrays.
+
+    Postings for term ``t`` are ``doc_ids[offsets[t]:offsets[t + 1]]`` with matching
+    term frequencies in ``tfs``; scoring a query gathers its postings and sums the
+    per-posting BM25 contributions with numpy. Instances are immutable: ``extend`` and
+    ``remove`` return a new index, so readers can keep searching the old one while it is built.
+    """
+
+    def __init__(self, terms: Optional[List[str]] = None, offsets: Optional[np.ndarray] = None,
+                 doc_ids: Optional[np.ndarray] = None, tfs: Optional[np.ndarray] = None,
+                 doc_lengths: Optional[np.ndarray] = None, k1: float = 1.2, b: float = 0.75,
+                 vocabulary: Optional[Dict[str, int]] = None):
+        self.terms = terms or []
+        self.vocabulary = vocabulary if vocabulary is not None else {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.doc_ids = doc_ids if doc_ids is not None else np.zeros(0, dtype=np.int32)
+        self.tfs = tfs if tfs is not None else np.zeros(0, dtype=np.float32)
+        self.doc_lengths = doc_lengths if doc_lengths is not None else np.zeros(0, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def extend(self, documents: Sequence[str]) -> "BM25Index":
+        terms = list(self.terms)
+        vocabulary = dict(self.vocabulary)
+        new_terms: List[int] = []
+        new_docs: List[int] = []
+        new_tfs: List[int] = []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        base = len(self)
+        for i, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            lengths[i] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(terms)
+                    terms.append(term)
+                new_terms.append(term_id)
+                new_docs.append(base + i)
+                new_tfs.append(tf)
+
+        # New documents have the highest ids, so their postings go at the end of each posting
+        # list: one insert pass over the old arrays instead of re-sorting every posting.
+        new_terms_array = np.asarray(new_terms, dtype=np.int64)
+        order = np.argsort(new_terms_array, kind="stable")
+        old_ends = np.full(len(terms), len(self.doc_ids), dtype=np.int64)
+        old_ends[:len(self.offsets) - 1] = self.offsets[1:]
+        positions = old_ends[new_terms_array[order]]
+        doc_ids = np.insert(self.doc_ids, positions, np.asarray(new_docs, dtype=np.int32)[order])
+        tfs = np.insert(self.tfs, positions, np.asarray(new_tfs, dtype=np.float32)[order])
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:len(self.offsets)] = self.offsets[1:]
+        offsets[len(self.offsets):] = len(self.doc_ids)
+        offsets[1:] += np.cumsum(np.bincount(new_terms_array, minlength=len(terms)))
+
+        return BM25Index(terms, offsets, doc_ids, tfs, np.concatenate([self.doc_lengths, lengths]), self.k1, self.b,
+                         vocabulary)
+
+    def remove(self, doc_ids: Sequence[int]) -> "BM25Index":
+        """Return a new index without ``doc_ids``; later documents shift down to stay contiguous."""
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(doc_ids, dtype=np.int64)] = False
+        if keep.all():
+            return self
+        renumbered = (np.cumsum(keep) - 1).astype(np.int32)
+        kept_postings = keep[self.doc_ids]
+        posting_terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))[kept_postings]
+        offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(posting_terms, minlength=len(self.terms)))
+        # Terms left without postings stay in the vocabulary; they simply never match.
+        return BM25Index(self.terms, offsets, renumbered[self.doc_ids[kept_postings]], self.tfs[kept_postings],
+                         self.doc_lengths[keep], self.k1, self.b)
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, BM25 scores) of every document matching a query term."""
+        term_ids = np.array(
+            [self.vocabulary[term] for term in dict.fromkeys(tokenize(query)) if term in self.vocabulary],
+            dtype=np.int64
+        )
+        if not len(term_ids) or not len(self):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        starts, ends = self.offsets[term_ids], self.offsets[term_ids + 1]
+        df = ends - starts
+        idf = np.log1p((len(self) - df + 0.5) / (df + 0.5))
+        positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        docs = self.doc_ids[positions]
+        tf = self.tfs[positions]
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / max(self.avgdl, 1e-9))
+        contributions = np.repeat(idf, df) * tf * (self.k1 + 1) / (tf + norm)
+
+        if len(docs) * 4 > len(self):
+            # Common terms touch much of the corpus; a dense accumulator beats sorting.
+            totals = np.bincount(docs, weights=contributions, minlength=len(self))
+            matched = np.flatnonzero(totals)
+            return matched, totals[matched].astype(np.float32)
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        return unique_docs, np.bincount(inverse, weights=contributions).astype(np.float32)
+
+    def search(self, queries: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        results = []
+        for query in queries:
+            docs, scores = self.score(query)
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            results.append([(int(docs[i]), float(scores[i])) for i in order])
+        return results
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / TERMS_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.terms, f)
+        for name, array in ((OFFSETS_FILE, self.offsets), (DOC_IDS_FILE, self.doc_ids),
+                            (TFS_FILE, self.tfs), (DOC_LENGTHS_FILE, self.doc_lengths)):
+            with open(path / name, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+        with open(path / PARAMS_FILE, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "BM25Index":
+        path = Path(path)
+        mode = "r" if mmap else None
+        with open(path / TERMS_FILE, "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        with open(path / PARAMS_FILE, "r", encoding="utf-8") as f:
+            params = json.load(f)
+        return cls(
+            terms,
+            np.load(path / OFFSETS_FILE, mmap_mode=mode),
+            np.load(path / DOC_IDS_FILE, mmap_mode=mode),
+            np.load(path / TFS_FILE, mmap_mode=mode),
+            np.load(path / DOC_LENGTHS_FILE, mmap_mode=mode),
+            params.get("k1", 1.2),
+            params.get("b", 0.75)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self),
+            "terms": len(self.terms),
+            "postings": int(len(self.doc_ids)),
+            "postings_bytes": int(self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.doc_lengths.nbytes),
+        }
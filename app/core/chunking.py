@@ -0,0 +1,112 @@
+import hashlib
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+TokenCounter = Callable[[str], int]
+
+
+def count_tokens(text: str) -> int:
+    # Cheap stand-in for a WordPiece tokenizer: words and punctuation marks,
+    # with long identifiers counted as several pieces.
+    return sum(1 + len(match.group()) // 8 for match in TOKEN_PATTERN.finditer(text))
+
+
+def tokenizer_counter(model_name: str) -> TokenCounter:
+    from transformers import AutoTokenizer
+
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return lambda text: len(tokenizer.tokenize(text))
+
+
+def chunk_id(source: str, chunk: int) -> str:
+    return f"{source}#{chunk}"
+
+
+def document_id(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Stable id of a document: its source path and chunk number, or else a hash of its text."""
+    metadata = metadata or {}
+    if metadata.get("source") is not None and metadata.get("chunk") is not None:
+        return chunk_id(metadata["source"], metadata["chunk"])
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _split_oversized(text: str, start: int, end: int, max_tokens: int,
+                     counter: TokenCounter) -> List[Tuple[int, int, int]]:
+    pieces = []
+    piece_start = last_end = start
+    piece_tokens = 0
+    for match in TOKEN_PATTERN.finditer(text, start, end):
+        tokens = counter(match.group())
+        if piece_tokens + tokens > max_tokens and piece_tokens:
+            pieces.append((piece_start, last_end, piece_tokens))
+            piece_start, piece_tokens = match.start(), 0
+        piece_tokens += tokens
+        last_end = match.end()
+    if piece_tokens:
+        pieces.append((piece_start, last_end, piece_tokens))
+    return pieces
+
+
+def chunk_section(text: str, start: int, end: int, max_tokens: int = 200, overlap_tokens: int = 40,
+                  counter: Optional[TokenCounter] = None) -> List[Tuple[int, int]]:
+    """
+    Split ``text[start:end]`` into (start, end) spans of at most ``max_tokens``,
+    breaking on line (paragraph) boundaries and repeating up to ``overlap_tokens``
+    of trailing paragraphs at the head of the next span.
+    """
+    counter = counter or count_tokens
+    units: List[Tuple[int, int, int]] = []
+    for match in re.finditer(r"[^\n]+", text[start:end]):
+        unit_start, unit_end = start + match.start(), start + match.end()
+        tokens = counter(text[unit_start:unit_end])
+        if tokens > max_tokens:
+            # Leave room for a heading or overlap carried in front of the first piece.
+            piece_tokens = max(1, max_tokens - overlap_tokens)
+            units.extend(_split_oversized(text, unit_start, unit_end, piece_tokens, counter))
+        elif tokens:
+            units.append((unit_start, unit_end, tokens))
+
+    spans: List[Tuple[int, int]] = []
+    current: List[Tuple[int, int, int]] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[2] > max_tokens:
+            spans.append((current[0][0], current[-1][1]))
+            overlap: List[Tuple[int, int, int]] = []
+            overlap_total = 0
+            for previous in reversed(current):
+                if overlap_total + previous[2] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous[2]
+            if overlap_total + unit[2] > max_tokens:
+                overlap, overlap_total = [], 0
+            current, current_tokens = overlap, overlap_total
+        current.append(unit)
+        current_tokens += unit[2]
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+    return spans
+
+
+def chunk_document(text: str, sections: List[Tuple[str, int, int]], source: str, max_tokens: int = 200,
+                   overlap_tokens: int = 40, counter: Optional[TokenCounter] = None) -> List[Dict[str, Any]]:
+    chunks = []
+    for title, section_start, section_end in sections:
+        for start, end in chunk_section(text, section_start, section_end, max_tokens, overlap_tokens, counter):
+            chunks.append({
+                "id": chunk_id(source, len(chunks)),
+                "text": text[start:end],
+                "metadata": {
+                    "source": source,
+                    "section": title,
+                    "start": start,
+                    "end": end,
+                    "chunk": len(chunks),
+                }
+            })
+    return chunks
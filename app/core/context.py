@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .chunking import TokenCounter, count_tokens
+
+
+def parse_model_budgets(value: Optional[str]) -> Dict[str, int]:
+    """Parse ``model=tokens,model=tokens`` into a dict."""
+    budgets = {}
+    for item in (value or "").split(","):
+        model, _, tokens = item.partition("=")
+        if model.strip() and tokens.strip():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ContextPacker:
+    """
+    Builds the prompt context from retrieved passages.
+
+    Passages are visited in retrieval order and dropped when their embedding is within
+    ``dedup_threshold`` cosine similarity of one already kept; the rest are re-ordered
+    by maximal marginal relevance and packed greedily until the model's token budget
+    is used up.
+    """
+
+    def __init__(self, token_budget: int = 2000, model_budgets: Optional[Dict[str, int]] = None,
+                 dedup_threshold: float = 0.95, mmr_lambda: float = 0.7, counter: TokenCounter = count_tokens):
+        self.token_budget = token_budget
+        self.model_budgets = model_budgets or {}
+        self.dedup_threshold = dedup_threshold
+        self.mmr_lambda = mmr_lambda
+        self.counter = counter
+
+    def budget_for(self, model_name: Optional[str]) -> int:
+        return self.model_budgets.get(model_name or "", self.token_budget)
+
+    def pack(self, query_vector: np.ndarray, passages: List[Dict[str, Any]], passage_vectors: np.ndarray,
+             model_name: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        budget = self.budget_for(model_name)
+        tokens = [self.counter(passage["document"]) for passage in passages]
+        stats = {
+            "token_budget": budget,
+            "passages_in": len(passages),
+            "tokens_in": sum(tokens),
+        }
+        if not passages:
+            return [], {**stats, "passages_used": 0, "duplicates_removed": 0, "dropped_for_budget": 0,
+                        "tokens_used": 0, "tokens_saved": 0}
+
+        vectors = _normalize(passage_vectors)
+        similarity = vectors @ vectors.T
+        relevance = vectors @ _normalize(query_vector.reshape(-1))
+
+        kept: List[int] = []
+        for i in range(len(passages)):
+            if not kept or similarity[i, kept].max() < self.dedup_threshold:
+                kept.append(i)
+
+        order = self._mmr(np.array(kept), relevance, similarity)
+
+        packed: List[Dict[str, Any]] = []
+        used = 0
+        for i in order:
+            if used + tokens[i] <= budget:
+                packed.append(passages[i])
+                used += tokens[i]
+            elif not packed:
+                # Even the best passage is over budget: keep a truncated copy of it.
+                passage = {**passages[i], "document": self._truncate(passages[i]["document"], budget), "truncated": True}
+                packed.append(passage)
+                used += self.counter(passage["document"])
+
+        return packed, {
+            **stats,
+            "passages_used": len(packed),
+            "duplicates_removed": len(passages) - len(kept),
+            "dropped_for_budget": len(kept) - len(packed),
+            "tokens_used": used,
+            "tokens_saved": stats["tokens_in"] - used,
+        }
+
+    def _mmr(self, candidates: np.ndarray, relevance: np.ndarray, similarity: np.ndarray) -> List[int]:
+        order: List[int] = []
+        remaining = np.ones(len(candidates), dtype=bool)
+        # Highest similarity of each candidate to anything already selected.
+        redundancy = np.full(len(candidates), -np.inf, dtype="float32")
+        for _ in range(len(candidates)):
+            scores = self.mmr_lambda * relevance[candidates] - (1 - self.mmr_lambda) * np.where(
+                np.isfinite(redundancy), redundancy, 0.0
+            )
+            scores[~remaining] = -np.inf
+            best = int(np.argmax(scores))
+            remaining[best] = False
+            order.append(int(candidates[best]))
+            redundancy = np.maximum(redundancy, similarity[candidates, candidates[best]])
+        return order
+
+    def _truncate(self, text: str, budget: int) -> str:
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.counter(" ".join(words[:middle])) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Sequence
+
+from .metrics import STAGES_SKIPPED
+
+OPTIONAL_STAGES = ("query_analysis", "reformulation", "quality_scoring")
+
+
+class DeadlineExceeded(RuntimeError):
+    """A request ran out of its time budget."""
+
+
+class RequestBudget:
+    """Deadline of one request, and the optional stages it skipped to meet it."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.deadline = time.monotonic() + self.seconds if self.seconds else None
+        self.skipped: Dict[str, str] = {}
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def skip(self, stage: str, reason: str) -> None:
+        if stage not in self.skipped:
+            self.skipped[stage] = reason
+            STAGES_SKIPPED.inc(stage=stage, reason=reason)
+
+    @property
+    def skipped_stages(self) -> List[str]:
+        return list(self.skipped)
+
+    async def run(self, stage: str, awaitable: Awaitable[Any], reserve: float = 0.0) -> Any:
+        """Await ``awaitable``, cancelling it once less than ``reserve`` seconds of the budget are left."""
+        remaining = self.remaining()
+        if remaining is None:
+            return await awaitable
+        timeout = remaining - reserve
+        if timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(f"No time left for {stage} before the request deadline")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError as e:
+            if self.remaining() > reserve:
+                # Raised by the stage itself, not by the deadline.
+                raise
+            raise DeadlineExceeded(f"{stage} did not finish before the request deadline") from e
+
+
+_current_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar(
+    "aifaq_request_budget", default=None
+)
+
+
+def start_budget(seconds: Optional[float] = None) -> RequestBudget:
+    """Give the current request (and the tasks it spawns) a deadline ``seconds`` from now; None for none."""
+    budget = RequestBudget(seconds)
+    _current_budget.set(budget)
+    return budget
+
+
+def current_budget() -> Optional[RequestBudget]:
+    return _current_budget.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    budget = _current_budget.get()
+    return budget.remaining() if budget is not None else None
+
+
+class DegradationPolicy:
+    """
+    Decides which optional stages a request can afford. All of them are skipped while more
+    than ``max_in_flight`` queries are being answered. Otherwise a stage is skipped when its
+    recent latency plus that of the stages still required after it, times ``safety_factor``,
+    does not fit in the time left before the deadline. Recent latencies are exponentially
+    weighted moving averages of each stage's observed durations.
+    """
+
+    def __init__(self, enabled: bool = True, max_in_flight: int = 32, safety_factor: float = 1.5,
+                 alpha: float = 0.2):
+        self.enabled = enabled
+        self.max_in_flight = max(1, max_in_flight)
+        self.safety_factor = safety_factor
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            previous = self._estimates.get(stage)
+            self._estimates[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def estimate(self, *stages: str) -> float:
+        with self._lock:
+            return self.safety_factor * sum(self._estimates.get(stage, 0.0) for stage in stages)
+
+    def skip_reason(self, stage: str, in_flight: int, remaining: Optional[float],
+                    required: Sequence[str] = ()) -> Optional[str]:
+        """Why ``stage`` should be skipped ("load" or "deadline"), or None to run it."""
+        if not self.enabled:
+            return None
+        if in_flight > self.max_in_flight:
+            return "load"
+        if remaining is not None and self.estimate(stage, *required) > remaining:
+            return "deadline"
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            estimates = {stage: round(seconds * 1000, 3) for stage, seconds in self._estimates.items()}
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "safety_factor": self.safety_factor,
+            "stage_estimates_ms": estimates,
+        }
@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+COMPRESSIONS = ("zlib", "zstd")
+
+
+def _codec(compression: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if compression == "zlib":
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd document compression requires the 'zstandard' package") from e
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class DocumentStore:
+    """
+    Compact sequence of UTF-8 records: one contiguous byte buffer plus an int64
+    offsets array instead of one Python object per document.
+
+    With ``compression`` set, records are grouped into blocks of about ``block_size``
+    bytes that are compressed independently; reads decompress a single block and a few
+    recently used blocks are kept decompressed. Stores opened from disk with ``mmap``
+    are read-only views of the file until the first write copies them into memory.
+    """
+
+    def __init__(self, records: Iterable[Any] = (), compression: Optional[str] = None, block_size: int = 64 * 1024,
+                 encoder: Optional[Callable[[Any], str]] = None, decoder: Optional[Callable[[str], Any]] = None,
+                 cache_blocks: int = 8):
+        self.compression = compression if compression not in (None, "", "none") else None
+        self.block_size = block_size
+        self._encoder = encoder
+        self._decoder = decoder
+        self._compress, self._decompress = _codec(self.compression) if self.compression else (None, None)
+        self._cache_blocks = cache_blocks
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._size = 0
+        self._offsets = np.zeros(1, dtype=np.int64)
+        # Uncompressed: the record bytes. Compressed: the sealed blocks, back to back.
+        self._data: Any = bytearray()
+        # Compressed only: byte range of each block in _data and the first row of each block
+        # (the last entry is the first row of the unsealed tail, kept raw in _tail).
+        self._block_offsets = np.zeros(1, dtype=np.int64)
+        self._block_rows = np.zeros(1, dtype=np.int64)
+        self._tail = bytearray()
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(range(*i.indices(len(self))))
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        text = str(self.raw(i), "utf-8")
+        return self._decoder(text) if self._decoder else text
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, rows: Iterable[int]) -> List[Any]:
+        return [self[row] for row in rows]
+
+    def raw(self, i: int) -> memoryview:
+        """Zero-copy view of record ``i``'s UTF-8 bytes, valid until the store is next modified."""
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        if not self.compression:
+            return memoryview(self._data)[start:end]
+        sealed_rows = int(self._block_rows[-1])
+        if i >= sealed_rows:
+            base = int(self._offsets[sealed_rows])
+            return memoryview(self._tail)[start - base:end - base]
+        block = int(np.searchsorted(self._block_rows, i, side="right")) - 1
+        base = int(self._offsets[self._block_rows[block]])
+        return memoryview(self._block(block))[start - base:end - base]
+
+    def extend(self, records: Iterable[Any]) -> None:
+        self._make_writable()
+        encoded = [(self._encoder(record) if self._encoder else record).encode("utf-8") for record in records]
+        if not encoded:
+            return
+        lengths = np.fromiter((len(item) for item in encoded), dtype=np.int64, count=len(encoded))
+        offsets = self._offsets[self._size] + np.cumsum(lengths)
+        self._reserve(self._size + len(encoded))
+        self._offsets[self._size + 1:self._size + 1 + len(encoded)] = offsets
+        if not self.compression:
+            self._data.extend(b"".join(encoded))
+            self._size += len(encoded)
+            return
+        for item in encoded:
+            self._tail.extend(item)
+            self._size += 1
+            if len(self._tail) >= self.block_size:
+                self._seal()
+
+    def append(self, record: Any) -> None:
+        self.extend([record])
+
+    def filter(self, keep: np.ndarray) -> "DocumentStore":
+        """Return a new store holding only the rows where ``keep`` is True."""
+        keep = np.asarray(keep, dtype=bool)
+        store = self._empty()
+        lengths = np.diff(self._offsets[:self._size + 1])[keep]
+        store._reserve(len(lengths))
+        store._offsets[1:len(lengths) + 1] = np.cumsum(lengths)
+        store._size = len(lengths)
+        if not self.compression:
+            # Copy runs of kept rows rather than row by row.
+            edges = np.flatnonzero(np.diff(np.concatenate([[False], keep, [False]]).astype(np.int8)))
+            data = memoryview(self._data)
+            store._data = bytearray(b"".join(
+                data[self._offsets[start]:self._offsets[end]] for start, end in zip(edges[::2], edges[1::2])
+            ))
+            return store
+
+        new_rows = np.concatenate([[0], np.cumsum(keep)])
+        for block in range(len(self._block_rows) - 1):
+            first, last = int(self._block_rows[block]), int(self._block_rows[block + 1])
+            kept = int(new_rows[last] - new_rows[first])
+            if kept == 0:
+                continue
+            if kept == last - first:
+                # Untouched blocks are carried over still compressed.
+                payload = bytes(memoryview(self._data)[self._block_offsets[block]:self._block_offsets[block + 1]])
+            else:
+                payload = self._compress(b"".join(self.raw(row) for row in range(first, last) if keep[row]))
+            store._data.extend(payload)
+            store._block_offsets = np.append(store._block_offsets, len(store._data))
+            store._block_rows = np.append(store._block_rows, new_rows[last])
+        store._tail = bytearray(b"".join(
+            self.raw(row) for row in range(int(self._block_rows[-1]), self._size) if keep[row]
+        ))
+        return store
+
+    def save(self, data_path: Path, offsets_path: Path, blocks_path: Optional[Path] = None) -> int:
+        """Write the store to disk; returns the size of the data file in bytes."""
+        with open(data_path, "wb") as f:
+            if not self.compression:
+                f.write(memoryview(self._data)[:int(self._offsets[self._size])])
+                size = int(self._offsets[self._size])
+                block_offsets, block_rows = None, None
+            else:
+                f.write(memoryview(self._data)[:int(self._block_offsets[-1])])
+                block_offsets, block_rows = self._block_offsets, self._block_rows
+                if self._tail:
+                    tail = self._compress(bytes(self._tail))
+                    f.write(tail)
+                    block_offsets = np.append(block_offsets, block_offsets[-1] + len(tail))
+                    block_rows = np.append(block_rows, self._size)
+                size = int(block_offsets[-1])
+            f.flush()
+            os.fsync(f.fileno())
+        _save_array(offsets_path, self._offsets[:self._size + 1])
+        if self.compression:
+            if blocks_path is None:
+                raise ValueError("Compressed stores need a blocks file")
+            _save_array(blocks_path, np.stack([block_offsets, block_rows]))
+        return size
+
+    @classmethod
+    def open(cls, data_path: Path, offsets_path: Path, mmap: bool = True, compression: Optional[str] = None,
+             blocks_path: Optional[Path] = None, json_records: bool = False) -> "DocumentStore":
+        store = json_store(compression=compression) if json_records else cls(compression=compression)
+        store._offsets = np.load(offsets_path, mmap_mode="r" if mmap else None)
+        store._size = len(store._offsets) - 1
+        if mmap and os.path.getsize(data_path) > 0:
+            store._data = np.memmap(data_path, dtype=np.uint8, mode="r")
+        else:
+            store._data = np.fromfile(data_path, dtype=np.uint8)
+        if compression:
+            store._block_offsets, store._block_rows = np.load(blocks_path)
+        return store
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            len(self._data) + len(self._tail) + self._offsets.nbytes
+            + self._block_offsets.nbytes + self._block_rows.nbytes
+        )
+
+    @property
+    def raw_bytes(self) -> int:
+        return int(self._offsets[self._size])
+
+    def _empty(self) -> "DocumentStore":
+        return DocumentStore(compression=self.compression, block_size=self.block_size, encoder=self._encoder,
+                             decoder=self._decoder, cache_blocks=self._cache_blocks)
+
+    def _block(self, block: int) -> bytes:
+        with self._cache_lock:
+            raw = self._cache.get(block)
+            if raw is not None:
+                self._cache.move_to_end(block)
+                return raw
+        start, end = self._block_offsets[block], self._block_offsets[block + 1]
+        raw = self._decompress(bytes(memoryview(self._data)[start:end]))
+        with self._cache_lock:
+            self._cache[block] = raw
+            if len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return raw
+
+    def _seal(self) -> None:
+        payload = self._compress(bytes(self._tail))
+        self._data.extend(payload)
+        self._block_offsets = np.append(self._block_offsets, len(self._data))
+        self._block_rows = np.append(self._block_rows, self._size)
+        self._tail = bytearray()
+
+    def _reserve(self, size: int) -> None:
+        # Amortized growth of the offsets array.
+        if len(self._offsets) < size + 1:
+            grown = np.zeros(max(size + 1, 2 * len(self._offsets)), dtype=np.int64)
+            grown[:self._size + 1] = self._offsets[:self._size + 1]
+            self._offsets = grown
+
+    def _make_writable(self) -> None:
+        if not isinstance(self._data, bytearray):
+            end = int(self._block_offsets[-1]) if self.compression else int(self._offsets[self._size])
+            self._data = bytearray(memoryview(self._data)[:end])
+            self._offsets = np.array(self._offsets[:self._size + 1])
+            self._block_offsets = np.array(self._block_offsets)
+            self._block_rows = np.array(self._block_rows)
+
+
+def _dump_json(item: Any) -> str:
+    return json.dumps(item, separators=(",", ":"))
+
+
+def json_store(records: Iterable[Any] = (), **options: Any) -> DocumentStore:
+    """A store of JSON-serializable records, such as per-document metadata."""
+    return DocumentStore(records, encoder=_dump_json, decoder=json.loads, **options)
+
+
+def as_document_store(records: Sequence[Any], json_records: bool = False) -> DocumentStore:
+    if isinstance(records, DocumentStore):
+        return records
+    return json_store(records) if json_records else DocumentStore(records)
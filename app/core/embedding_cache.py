@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SQLITE_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: a bounded in-memory LRU in front of an optional
+    SQLite store on disk. Entries are keyed by a hash of the model name and the
+    whitespace-normalized text, so one store can be shared between models.
+    """
+
+    def __init__(self, model_name: str, dimension: int, capacity: int = 10000, cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.capacity = capacity
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        self.path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, "embeddings.sqlite")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8"), digest_size=16).digest()
+
+    def encode(self, texts: Sequence[str], encoder: Callable[[List[str]], Any]) -> np.ndarray:
+        keys = [self.key(text) for text in texts]
+        vectors: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+            self.memory_hits += sum(1 for key in keys if key in vectors)
+
+        pending = list(dict.fromkeys(key for key in keys if key not in vectors))
+        if pending and self._db is not None:
+            found = self._read_disk(pending)
+            vectors.update(found)
+            self._remember(found)
+            with self._lock:
+                self.disk_hits += sum(1 for key in keys if key in found)
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = np.asarray(encoder(list(missing.values())), dtype="float32").reshape(len(missing), self.dimension)
+            computed = dict(zip(missing.keys(), encoded))
+            vectors.update(computed)
+            self._remember(computed)
+            self._write_disk(computed)
+            with self._lock:
+                self.misses += sum(1 for key in keys if key in computed)
+
+        if not keys:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.stack([vectors[key] for key in keys]).astype("float32", copy=False)
+
+    def _remember(self, items: Dict[bytes, np.ndarray]) -> None:
+        if self.capacity <= 0 or not items:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_BATCH):
+                batch = keys[i:i + SQLITE_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype="float32")
+                    if vector.size == self.dimension:
+                        found[bytes(key)] = vector
+        return found
+
+    def _write_disk(self, items: Dict[bytes, np.ndarray]) -> None:
+        if self._db is None or not items:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.ascontiguousarray(vector, dtype="float32").tobytes()) for key, vector in items.items()]
+            )
+            self._db.commit()
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.capacity,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_path": self.path,
+            }
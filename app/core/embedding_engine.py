@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as 0
+    resource = None
+
+import numpy as np
+
+from .chunking import TokenCounter, count_tokens
+from .lazy import timed_import
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the calling process."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[np.ndarray]:
+    """Positions sorted by length and cut into batches, so each batch pads to a similar length."""
+    order = np.argsort(np.asarray(lengths, dtype=np.int64), kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    if threads > 0:
+        # Before torch is imported, so its thread pools are sized once.
+        os.environ["OMP_NUM_THREADS"] = os.environ["MKL_NUM_THREADS"] = str(threads)
+    _worker_model = timed_import("sentence_transformers").SentenceTransformer(model_name)
+    torch = sys.modules.get("torch")
+    if threads > 0 and torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _encode_batch(texts: List[str]) -> Tuple[np.ndarray, int, int]:
+    embeddings = np.asarray(_worker_model.encode(texts, batch_size=len(texts)), dtype="float32")
+    return embeddings, os.getpid(), peak_rss_bytes()
+
+
+class EmbeddingEngine:
+    """
+    Bulk document encoder for ingestion. Inputs are sorted by estimated token length and
+    cut into batches of ``batch_size``, so short snippets are not padded to the length of
+    the longest page in their batch. With ``workers`` > 0 the batches are spread over a
+    pool of processes that each load their own copy of the model and use ``threads``
+    torch threads; otherwise they run through ``encoder`` in this process.
+    """
+
+    def __init__(self, model_name: str, encoder: Callable[..., Any], workers: int = 0, batch_size: int = 32,
+                 threads: int = 0, max_tokens: Optional[int] = None, counter: TokenCounter = count_tokens):
+        self.model_name = model_name
+        self.encoder = encoder
+        self.workers = max(0, workers)
+        self.batch_size = max(1, batch_size)
+        self.threads = max(0, threads)
+        self.max_tokens = max_tokens
+        self.counter = counter
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._worker_rss: Dict[int, int] = {}
+        self.documents = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        started = time.perf_counter()
+        lengths = np.fromiter((self.counter(text) for text in texts), dtype=np.int64, count=len(texts))
+        if self.max_tokens:
+            # The model truncates longer inputs, so they pad no further than this.
+            lengths = np.minimum(lengths, self.max_tokens)
+        batches = length_buckets(lengths, self.batch_size)
+        output: Optional[np.ndarray] = None
+        for batch, (embeddings, pid, rss) in zip(batches, self._run([[texts[i] for i in batch] for batch in batches])):
+            if output is None:
+                output = np.zeros((len(texts), embeddings.shape[1]), dtype="float32")
+            output[batch] = embeddings
+            with self._lock:
+                self._worker_rss[pid] = max(rss, self._worker_rss.get(pid, 0))
+
+        with self._lock:
+            self.documents += len(texts)
+            self.batches += len(batches)
+            self.seconds += time.perf_counter() - started
+            self.tokens += int(lengths.sum())
+            self.padded_tokens += sum(len(batch) * int(lengths[batch].max()) for batch in batches)
+        return output if output is not None else np.zeros((0, 0), dtype="float32")
+
+    def _run(self, batches: List[List[str]]) -> Any:
+        if not self.workers:
+            return (
+                (np.asarray(self.encoder(batch, batch_size=len(batch)), dtype="float32"), os.getpid(), peak_rss_bytes())
+                for batch in batches
+            )
+        try:
+            return list(self._get_pool().map(_encode_batch, batches))
+        except BrokenProcessPool:
+            # A worker died (usually out of memory); start a fresh pool on the next call.
+            self.close()
+            raise
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked: the parent may already hold torch thread pools.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.threads)
+                )
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            worker_rss = sum(rss for pid, rss in self._worker_rss.items() if pid != os.getpid())
+            return {
+                "workers": self.workers,
+                "batch_size": self.batch_size,
+                "threads": self.threads,
+                "documents": self.documents,
+                "batches": self.batches,
+                "seconds": round(self.seconds, 3),
+                "documents_per_second": round(self.documents / self.seconds, 2) if self.seconds else None,
+                # Share of encoded positions that are padding.
+                "padding_ratio": round(1 - self.tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "worker_peak_rss_bytes": worker_rss,
+            }
@@ -0,0 +1,28 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists with RRF: score(d) = sum_i w_i / (k + rank_i(d))."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+def weighted_score_fusion(scored_lists: Sequence[Sequence[Tuple[Hashable, float]]],
+                          weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Fuse (id, score) lists by min-max normalizing each list's scores and summing them with weights."""
+    weights = weights or [1.0] * len(scored_lists)
+    scores: Dict[Hashable, float] = {}
+    for scored, weight in zip(scored_lists, weights):
+        if not scored:
+            continue
+        values = [score for _, score in scored]
+        low, high = min(values), max(values)
+        for item, score in scored:
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            scores[item] = scores.get(item, 0.0) + weight * normalized
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
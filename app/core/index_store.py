@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within one process
+    fcntl = None
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .document_store import DocumentStore, as_document_store
+from .lazy import lazy_import
+from .vector_store import VectorStore
+
+faiss = lazy_import("faiss")
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+GENERATION_PREFIX = "gen-"
+TMP_PREFIX = ".tmp-"
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "documents.bin"
+OFFSETS_FILE = "documents.offsets.npy"
+BLOCKS_FILE = "documents.blocks.npy"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata.offsets.npy"
+METADATA_BLOCKS_FILE = "metadata.blocks.npy"
+IDS_FILE = "ids.bin"
+IDS_OFFSETS_FILE = "ids.offsets.npy"
+LABELS_FILE = "labels.npy"
+VECTORS_FILE = "vectors.npy"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_DIR = "bm25"
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_index(path: Path, mmap: bool = True) -> Any:
+    if mmap and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        try:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP_IFC)
+        except RuntimeError:
+            pass
+    return faiss.read_index(str(path))
+
+
+class IndexSnapshotStore:
+    """
+    Generational on-disk snapshots of a FAISS index and its document store.
+
+    Each save is written into a private temporary directory, fsynced and renamed
+    to ``gen-<n>``; only then is the ``CURRENT`` pointer atomically replaced, so a
+    crashed or half-written save is never visible to ``load``. Saves hold an exclusive
+    lock on ``LOCK``, so several processes can share one store with a single writer at a time.
+    """
+
+    def __init__(self, root: str, keep_generations: int = 2):
+        self.root = Path(root)
+        self.keep_generations = max(1, keep_generations)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock_mutex = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+
+    @contextmanager
+    def writer_lock(self) -> Iterator[None]:
+        """Exclusive across processes (flock) and threads; re-entrant within a thread."""
+        with self._lock_mutex:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.root / LOCK_FILE, "a+")
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Closing the file releases the flock.
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _generation_dir(self, generation: int) -> Path:
+        return self.root / f"{GENERATION_PREFIX}{generation:08d}"
+
+    def list_generations(self) -> List[int]:
+        generations = []
+        for entry in self.root.iterdir():
+            if entry.is_dir() and entry.name.startswith(GENERATION_PREFIX):
+                try:
+                    generations.append(int(entry.name[len(GENERATION_PREFIX):]))
+                except ValueError:
+                    continue
+        return sorted(generations)
+
+    def current_generation(self) -> Optional[int]:
+        try:
+            name = (self.root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        if not name.startswith(GENERATION_PREFIX):
+            return None
+        try:
+            return int(name[len(GENERATION_PREFIX):])
+        except ValueError:
+            return None
+
+    def current_path(self) -> Optional[Path]:
+        generation = self.current_generation()
+        return self._generation_dir(generation) if generation is not None else None
+
+    def save(self, index: Any, documents: Sequence[str], document_metadata: Optional[Sequence[Dict[str, Any]]] = None,
+             info: Optional[Dict[str, Any]] = None, lexical_index: Optional[BM25Index] = None,
+             document_ids: Optional[Sequence[str]] = None, labels: Optional[np.ndarray] = None,
+             vectors: Optional[VectorStore] = None) -> int:
+        with self.writer_lock():
+            return self._save(index, documents, document_metadata, info, lexical_index, document_ids, labels, vectors)
+
+    def _save(self, index: Any, documents: Sequence[str], document_metadata: Optional[Sequence[Dict[str, Any]]],
+              info: Optional[Dict[str, Any]], lexical_index: Optional[BM25Index],
+              document_ids: Optional[Sequence[str]], labels: Optional[np.ndarray],
+              vectors: Optional[VectorStore]) -> int:
+        # Safe under the writer lock: any temporary directory left is from a crashed save.
+        self._remove_stale_tmp()
+        generation = max(self.list_generations() + [self.current_generation() or 0]) + 1
+        tmp_dir = self.root / f"{TMP_PREFIX}{generation:08d}-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            if index is not None:
+                faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+            documents = as_document_store(documents)
+            text_bytes = documents.save(tmp_dir / DOCS_FILE, tmp_dir / OFFSETS_FILE, tmp_dir / BLOCKS_FILE)
+            if document_metadata is None:
+                document_metadata = [{}] * len(documents)
+            document_metadata = as_document_store(document_metadata, json_records=True)
+            metadata_bytes = document_metadata.save(
+                tmp_dir / METADATA_FILE, tmp_dir / METADATA_OFFSETS_FILE, tmp_dir / METADATA_BLOCKS_FILE
+            )
+            if lexical_index is not None:
+                lexical_index.save(tmp_dir / LEXICAL_DIR)
+            if document_ids is not None:
+                # Row i is stored in the FAISS index under labels[i].
+                as_document_store(document_ids).save(tmp_dir / IDS_FILE, tmp_dir / IDS_OFFSETS_FILE)
+                with open(tmp_dir / LABELS_FILE, "wb") as f:
+                    np.save(f, np.asarray(labels, dtype=np.int64))
+                    f.flush()
+                    os.fsync(f.fileno())
+            if vectors is not None:
+                # Full-precision copies of the (possibly quantized) index vectors, by row.
+                vectors.save(tmp_dir / VECTORS_FILE)
+
+            manifest = {
+                "generation": generation,
+                "created_at": time.time(),
+                "has_index": index is not None,
+                "has_lexical_index": lexical_index is not None,
+                "has_document_ids": document_ids is not None,
+                "has_vectors": vectors is not None,
+                "total_documents": len(documents),
+                "text_bytes": text_bytes,
+                "metadata_bytes": metadata_bytes,
+                "document_compression": documents.compression,
+                "metadata_compression": document_metadata.compression,
+                "info": info or {},
+            }
+            with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_dir(tmp_dir)
+
+            final_dir = self._generation_dir(generation)
+            os.rename(tmp_dir, final_dir)
+            _fsync_dir(self.root)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._write_current(final_dir.name)
+        self._prune()
+        return generation
+
+    def load(self, mmap: bool = True) -> Optional[Dict[str, Any]]:
+        generation_dir = self.current_path()
+        if generation_dir is None:
+            return None
+
+        with open(generation_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if os.path.getsize(generation_dir / DOCS_FILE) != manifest["text_bytes"]:
+            raise RuntimeError(f"Corrupt snapshot {generation_dir}: document store size mismatch")
+
+        index_path = generation_dir / INDEX_FILE
+        index = read_index(index_path, mmap=mmap) if manifest["has_index"] else None
+        documents = DocumentStore.open(
+            generation_dir / DOCS_FILE, generation_dir / OFFSETS_FILE, mmap=mmap,
+            compression=manifest.get("document_compression"), blocks_path=generation_dir / BLOCKS_FILE
+        )
+        if (generation_dir / METADATA_FILE).exists():
+            document_metadata = DocumentStore.open(
+                generation_dir / METADATA_FILE, generation_dir / METADATA_OFFSETS_FILE, mmap=mmap,
+                compression=manifest.get("metadata_compression"), blocks_path=generation_dir / METADATA_BLOCKS_FILE,
+                json_records=True
+            )
+        else:
+            document_metadata = as_document_store([{}] * len(documents), json_records=True)
+        lexical_index = None
+        if manifest.get("has_lexical_index"):
+            lexical_index = BM25Index.load(generation_dir / LEXICAL_DIR, mmap=mmap)
+        document_ids, labels = None, None
+        if manifest.get("has_document_ids"):
+            document_ids = DocumentStore.open(generation_dir / IDS_FILE, generation_dir / IDS_OFFSETS_FILE, mmap=mmap)
+            labels = np.load(generation_dir / LABELS_FILE, mmap_mode="r" if mmap else None)
+        vectors = VectorStore.open(generation_dir / VECTORS_FILE, mmap=mmap) if manifest.get("has_vectors") else None
+        if len(documents) != manifest["total_documents"] or len(document_metadata) != len(documents):
+            raise RuntimeError(f"Corrupt snapshot {generation_dir}: document count mismatch")
+        if document_ids is not None and not len(document_ids) == len(labels) == len(documents):
+            raise RuntimeError(f"Corrupt snapshot {generation_dir}: document id count mismatch")
+        if lexical_index is not None and len(lexical_index) != len(documents):
+            raise RuntimeError(f"Corrupt snapshot {generation_dir}: lexical index size mismatch")
+        if vectors is not None and len(vectors) != len(documents):
+            raise RuntimeError(f"Corrupt snapshot {generation_dir}: vector count mismatch")
+
+        return {
+            "generation": manifest["generation"],
+            "path": str(generation_dir),
+            "index_path": str(index_path) if manifest["has_index"] else None,
+            "index": index,
+            "documents": documents,
+            "document_metadata": document_metadata,
+            "lexical_index": lexical_index,
+            "document_ids": document_ids,
+            "labels": labels,
+            "vectors": vectors,
+            "manifest": manifest,
+        }
+
+    def load_vectors(self, generation: int, mmap: bool = True) -> Optional[VectorStore]:
+        path = self._generation_dir(generation) / VECTORS_FILE
+        return VectorStore.open(path, mmap=mmap) if path.exists() else None
+
+    def _write_current(self, name: str) -> None:
+        tmp_path = self.root / f"{CURRENT_FILE}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.root / CURRENT_FILE)
+        _fsync_dir(self.root)
+
+    def _remove_stale_tmp(self) -> None:
+        for entry in self.root.iterdir():
+            if entry.name.startswith(TMP_PREFIX):
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _prune(self) -> None:
+        current = self.current_generation()
+        generations = self.list_generations()
+        for generation in generations[:-self.keep_generations]:
+            if generation != current:
+                shutil.rmtree(self._generation_dir(generation), ignore_errors=True)
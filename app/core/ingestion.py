@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .metrics import INGEST_DOCUMENTS, INGEST_JOBS
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("receiving", "queued", "running", "committed", "failed", "cancelled")
+FINISHED_STATES = ("committed", "failed", "cancelled")
+
+Record = Dict[str, Any]
+IngestFunction = Callable[[Iterable[List[Any]], Callable[[Dict[str, int]], None]], Dict[str, int]]
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, job_id: str, spool_path: str):
+        self.id = job_id
+        self.spool_path = spool_path
+        self.state = "receiving"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.bytes_received = 0
+        self.lines = 0
+        self.records = 0
+        self.counts = {"added": 0, "updated": 0, "unchanged": 0, "embedded": 0}
+        self.deleted = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.cancel_requested = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "bytes_received": self.bytes_received,
+            "lines": self.lines,
+            "records": self.records,
+            **self.counts,
+            "deleted": self.deleted,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "records_per_second": round(self.records / elapsed, 2) if elapsed else None,
+            "embedded_per_second": round(self.counts["embedded"] / elapsed, 2) if elapsed else None,
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+            "error": self.error,
+        }
+
+
+class IngestionManager:
+    """
+    Background ingestion jobs. An upload is spooled to disk as it streams in, so its size
+    costs disk rather than memory, then queued. One worker thread reads each spooled NDJSON
+    file ``batch_size`` records at a time and passes the batches lazily to ``ingest``, which
+    embeds them and commits the whole job at once. Records are parsed only as fast as they
+    are embedded, and at most ``max_queued_jobs`` uploads may be waiting before new ones
+    are refused with ``JobQueueFull``.
+    """
+
+    def __init__(self, ingest: IngestFunction, delete: Callable[[List[str], List[str]], int],
+                 spool_dir: Optional[str] = None, batch_size: int = 256, max_queued_jobs: int = 4,
+                 max_upload_bytes: int = 0, keep_jobs: int = 100, max_errors: int = 100):
+        self.ingest = ingest
+        self.delete = delete
+        self.spool_dir = spool_dir or tempfile.gettempdir()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self.max_queued_jobs = max(1, max_queued_jobs)
+        self.max_upload_bytes = max_upload_bytes
+        self.keep_jobs = keep_jobs
+        self.max_errors = max_errors
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    async def receive(self, chunks: AsyncIterable[bytes]) -> IngestionJob:
+        """Spool an uploaded NDJSON body to disk and queue it; returns once the upload is complete."""
+        with self._lock:
+            waiting = sum(1 for job in self._jobs.values() if job.state in ("receiving", "queued"))
+            if waiting >= self.max_queued_jobs:
+                raise JobQueueFull(f"{waiting} ingestion jobs are already waiting; retry later")
+            job_id = uuid.uuid4().hex
+            job = IngestionJob(job_id, os.path.join(self.spool_dir, f"ingest-{job_id}.ndjson"))
+            self._jobs[job_id] = job
+
+        try:
+            with open(job.spool_path, "wb") as f:
+                async for chunk in chunks:
+                    if job.cancel_requested.is_set():
+                        raise JobCancelled()
+                    job.bytes_received += len(chunk)
+                    if self.max_upload_bytes and job.bytes_received > self.max_upload_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {self.max_upload_bytes} bytes")
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException as e:
+            self._finish(job, "cancelled" if isinstance(e, JobCancelled) else "failed",
+                         str(e) or type(e).__name__)
+            if isinstance(e, JobCancelled):
+                return job
+            raise
+
+        job.state = "queued"
+        self._queue.put(job.id)
+        self._ensure_worker()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Cancel a job; a running one stops before its next batch and commits nothing."""
+        job = self._jobs.get(job_id)
+        if job is None or job.state in FINISHED_STATES:
+            return job
+        job.cancel_requested.set()
+        if job.state == "queued":
+            self._finish(job, "cancelled")
+        return job
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get(self._queue.get())
+            if job is None or job.state != "queued":
+                continue
+            self._process(job)
+
+    def _process(self, job: IngestionJob) -> None:
+        job.state = "running"
+        job.started_at = time.time()
+        deletes: Dict[str, List[str]] = {"ids": [], "sources": []}
+        try:
+            counts = self.ingest(self._batches(job, deletes), job.counts.update)
+            job.counts.update(counts)
+            # Like upload_docs.py: delete records apply once the upserts are committed.
+            if deletes["ids"] or deletes["sources"]:
+                job.deleted = self.delete(deletes["ids"], deletes["sources"])
+            for result in ("added", "updated", "unchanged"):
+                INGEST_DOCUMENTS.inc(job.counts[result], result=result)
+            self._finish(job, "committed")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", job.id)
+            self._finish(job, "failed", str(e))
+
+    def _batches(self, job: IngestionJob, deletes: Dict[str, List[str]]) -> Iterator[List[Any]]:
+        batch: List[Any] = []
+        with open(job.spool_path, "rb") as f:
+            for line in f:
+                if job.cancel_requested.is_set():
+                    raise JobCancelled()
+                job.lines += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if isinstance(record, dict) and "delete" in record:
+                        deletes["ids"].extend(record["delete"].get("ids") or [])
+                        deletes["sources"].extend(record["delete"].get("sources") or [])
+                        continue
+                    if not isinstance(record, str) and not (isinstance(record, dict) and isinstance(record.get("text"), str)):
+                        raise ValueError("expected a string or an object with a 'text' field")
+                    if isinstance(record, dict):
+                        if record.get("metadata") is not None and not isinstance(record["metadata"], dict):
+                            raise ValueError("'metadata' must be an object")
+                        if record.get("id") is not None and not isinstance(record["id"], str):
+                            raise ValueError("'id' must be a string")
+                except (ValueError, AttributeError) as e:
+                    self._record_error(job, job.lines, str(e))
+                    continue
+                job.records += 1
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+        if job.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def _record_error(self, job: IngestionJob, line: int, message: str) -> None:
+        job.error_count += 1
+        if len(job.errors) < self.max_errors:
+            job.errors.append({"line": line, "error": message})
+
+    def _finish(self, job: IngestionJob, state: str, error: Optional[str] = None) -> None:
+        job.state = state
+        job.error = error
+        job.finished_at = time.time()
+        INGEST_JOBS.inc(state=state)
+        try:
+            os.remove(job.spool_path)
+        except OSError:
+            pass
+        with self._lock:
+            finished = [job_id for job_id, item in self._jobs.items() if item.state in FINISHED_STATES]
+            for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+                del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in JOB_STATES}
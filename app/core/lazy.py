@@ -0,0 +1,65 @@
+import importlib
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+from .metrics import IMPORT_SECONDS
+
+_import_lock = threading.Lock()
+_import_times: Dict[str, float] = {}
+
+
+def record_import(name: str, seconds: float) -> None:
+    _import_times[name] = round(seconds, 4)
+    IMPORT_SECONDS.set(seconds, module=name)
+
+
+def import_times() -> Dict[str, float]:
+    return dict(_import_times)
+
+
+def timed_import(name: str) -> Any:
+    """Import ``name``, recording how long it took if this is the first import in the process."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _import_lock:
+        if name not in sys.modules:
+            start = time.perf_counter()
+            importlib.import_module(name)
+            record_import(name, time.perf_counter() - start)
+    return sys.modules[name]
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module that is imported on first attribute access, so
+    importing the app (workers, scripts, tests) does not pay for faiss or the
+    Gemini SDK until they are used. Attribute writes go to the real module.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self) -> Any:
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = timed_import(object.__getattribute__(self, "_name"))
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        name = object.__getattribute__(self, "_name")
+        return f"<lazy module {name!r}{'' if object.__getattribute__(self, '_module') is None else ' (loaded)'}>"
+
+
+def lazy_import(name: str) -> Any:
+    return LazyModule(name)
@@ -0,0 +1,275 @@
+import asyncio
+import functools
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from .deadline import DeadlineExceeded, remaining_seconds, start_budget
+from .lazy import lazy_import, timed_import
+from .metrics import REGISTRY
+
+genai = lazy_import("google.generativeai")
+
+LLM_CALLS = REGISTRY.counter("aifaq_llm_calls_total", "LLM calls by outcome", ["model", "outcome"])
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    api_exceptions = timed_import("google.api_core.exceptions")
+    return (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.DeadlineExceeded,
+        asyncio.TimeoutError,
+    )
+
+
+class LLMUnavailableError(RuntimeError):
+    """The LLM kept failing with retryable errors (quota, overload, timeouts)."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        # rate is in requests per second; 0 disables limiting.
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+                self.waited_seconds += delay
+                await asyncio.sleep(delay)
+
+
+def _genai_model(model_name: str) -> Any:
+    # Looked up at call time so genai.GenerativeModel can be swapped out (see scripts/fake_llm.py).
+    return genai.GenerativeModel(model_name)
+
+
+class LLMClient:
+    """
+    Shared entry point for every Gemini call.
+
+    Calls go through a token-bucket rate limiter and a concurrency semaphore, get a
+    per-attempt timeout, and are retried with exponential backoff and full jitter on
+    quota, overload and timeout errors. Identical in-flight ``generate`` calls (same
+    model, prompt and generation config) share a single request. Within a request that
+    has a deadline (see ``deadline.start_budget``), attempts are cut off and retries
+    stop when the deadline passes.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model_factory: Optional[Callable[[str], Any]] = None,
+                 max_concurrency: int = 8, requests_per_minute: float = 0, burst: Optional[int] = None,
+                 timeout_seconds: float = 30.0, max_retries: int = 3, backoff_base_seconds: float = 0.5,
+                 backoff_max_seconds: float = 8.0, coalesce: bool = True):
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self._configured = False
+        self.model_factory = model_factory or _genai_model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max(0, max_retries)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.coalesce = coalesce
+        self._bucket = TokenBucket(requests_per_minute / 60, burst)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._models: Dict[str, Any] = {}
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+
+        self.in_flight = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.deadlines = 0
+        self.failures = 0
+
+    def configure(self) -> None:
+        """Import and configure the Gemini SDK; done on first use unless warmed up earlier."""
+        if not self._configured:
+            genai.configure(api_key=self.api_key)
+            retryable_errors()
+            self._configured = True
+
+    def model(self, model_name: str) -> Any:
+        self.configure()
+        if model_name not in self._models:
+            self._models[model_name] = self.model_factory(model_name)
+        return self._models[model_name]
+
+    async def generate(self, model_name: str, prompt: str, generation_config: Any = None) -> Any:
+        if not self.coalesce:
+            return await self._generate(model_name, prompt, generation_config)
+
+        key = (model_name, prompt, repr(generation_config))
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            LLM_CALLS.inc(model=model_name, outcome="coalesced")
+        else:
+            future = asyncio.ensure_future(self._shared_generate(model_name, prompt, generation_config))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # A cancelled caller must not cancel the request other callers are waiting on...
+            remaining = remaining_seconds()
+            if remaining is None:
+                return await asyncio.shield(future)
+            if remaining <= 0:
+                raise self._deadline_error(model_name)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), remaining)
+            except asyncio.TimeoutError as e:
+                if self._deadline_passed():
+                    raise self._deadline_error(model_name) from e
+                raise
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                # ...but once none is left (e.g. all hit their deadlines) it is abandoned. Forget it
+                # first, so an identical prompt arriving before the cancellation lands starts afresh.
+                self._forget(key, future)
+                future.cancel()
+
+    def _forget(self, key: Tuple[str, str, str], future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def stream(self, model_name: str, prompt: str, generation_config: Any = None) -> AsyncIterator[Any]:
+        """Yield response chunks; only opening the stream is retried, each chunk gets the timeout."""
+        async with self._semaphore:
+            response = await self._with_retries(model_name, lambda model: model.generate_content_async(
+                prompt, generation_config=generation_config, stream=True
+            ))
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self._timeout(model_name))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError as e:
+                    if self._deadline_passed():
+                        raise self._deadline_error(model_name) from e
+                    raise
+                yield chunk
+
+    async def _shared_generate(self, model_name: str, prompt: str, generation_config: Any) -> Any:
+        # Runs as its own task on behalf of callers with different deadlines; each waiter applies its own.
+        start_budget(None)
+        return await self._generate(model_name, prompt, generation_config)
+
+    async def _generate(self, model_name: str, prompt: str, generation_config: Any) -> Any:
+        async with self._semaphore:
+            return await self._with_retries(model_name, lambda model: model.generate_content_async(
+                prompt, generation_config=generation_config
+            ))
+
+    async def _with_retries(self, model_name: str, call: Callable[[Any], Any]) -> Any:
+        model = self.model(model_name)
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            timeout = self._timeout(model_name)
+            self.calls += 1
+            self.in_flight += 1
+            try:
+                result = await asyncio.wait_for(call(model), timeout)
+                LLM_CALLS.inc(model=model_name, outcome="success")
+                return result
+            except retryable_errors() as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    LLM_CALLS.inc(model=model_name, outcome="timeout")
+                if self._deadline_passed():
+                    raise self._deadline_error(model_name) from e
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    LLM_CALLS.inc(model=model_name, outcome="unavailable")
+                    raise LLMUnavailableError(
+                        f"{model_name} unavailable after {attempt + 1} attempts: {str(e) or type(e).__name__}"
+                    ) from e
+            except Exception:
+                self.failures += 1
+                LLM_CALLS.inc(model=model_name, outcome="error")
+                raise
+            finally:
+                self.in_flight -= 1
+
+            delay = self._backoff(attempt)
+            remaining = remaining_seconds()
+            if remaining is not None and delay >= remaining:
+                # No time left for another attempt after the backoff.
+                raise self._deadline_error(model_name)
+            self.retries += 1
+            LLM_CALLS.inc(model=model_name, outcome="retry")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    def _timeout(self, model_name: str) -> float:
+        """Per-attempt timeout, capped by the time left before the request deadline."""
+        remaining = remaining_seconds()
+        if remaining is None:
+            return self.timeout_seconds
+        if remaining <= 0:
+            raise self._deadline_error(model_name)
+        return min(self.timeout_seconds, remaining)
+
+    def _deadline_passed(self) -> bool:
+        remaining = remaining_seconds()
+        return remaining is not None and remaining <= 0
+
+    def _deadline_error(self, model_name: str) -> DeadlineExceeded:
+        self.deadlines += 1
+        LLM_CALLS.inc(model=model_name, outcome="deadline")
+        return DeadlineExceeded(f"{model_name} call did not finish before the request deadline")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "deadlines": self.deadlines,
+            "failures": self.failures,
+            "rate_limit_wait_seconds": round(self._bucket.waited_seconds, 3),
+        }
+
+
+_client: Optional[LLMClient] = None
+
+
+def configure_llm_client(config: Optional[Dict[str, Any]] = None,
+                         model_factory: Optional[Callable[[str], Any]] = None) -> LLMClient:
+    global _client
+    _client = LLMClient(model_factory=model_factory, **(config or {}))
+    return _client
+
+
+def get_llm_client() -> LLMClient:
+    if _client is None:
+        configure_llm_client()
+    return _client
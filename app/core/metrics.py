@@ -0,0 +1,209 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        if self._callback is not None:
+            try:
+                lines.append(f"{self.name} {float(self._callback())}")
+            except Exception:
+                pass
+            return lines
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', repr(bound)))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {self._sums[key]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+AGENT_SECONDS = REGISTRY.histogram("aifaq_agent_run_seconds", "Latency of agent runs", ["agent"])
+AGENT_ERRORS = REGISTRY.counter("aifaq_agent_errors_total", "Agent runs that raised an error", ["agent"])
+STAGE_SECONDS = REGISTRY.histogram("aifaq_stage_seconds", "Latency of query pipeline stages", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("aifaq_stage_errors_total", "Pipeline stages that raised an error", ["stage"])
+STAGES_SKIPPED = REGISTRY.counter("aifaq_stages_skipped_total", "Optional pipeline stages skipped under load or deadline pressure", ["stage", "reason"])
+RETRIEVAL_SECONDS = REGISTRY.histogram("aifaq_retrieval_seconds", "Retrieval latency per search mode", ["mode"])
+LLM_TOKENS = REGISTRY.counter("aifaq_llm_tokens_total", "LLM tokens used", ["agent", "kind"])
+CONTEXT_TOKENS = REGISTRY.counter("aifaq_context_tokens_total", "Estimated context tokens sent to or saved from the LLM", ["kind"])
+INDEX_DOCUMENTS = REGISTRY.gauge("aifaq_index_documents", "Documents in the retrieval index")
+INGEST_JOBS = REGISTRY.counter("aifaq_ingest_jobs_total", "Ingestion jobs by final state", ["state"])
+INGEST_DOCUMENTS = REGISTRY.counter("aifaq_ingest_documents_total", "Documents committed by ingestion jobs", ["result"])
+IMPORT_SECONDS = REGISTRY.gauge("aifaq_import_seconds", "Time spent importing heavy modules at startup or first use", ["module"])
+WARM_UP_SECONDS = REGISTRY.gauge("aifaq_warm_up_seconds", "Time spent loading models and indexes per agent", ["agent"])
+
+_current_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "aifaq_request_timings", default=None
+)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Collect stage timings for the current request (visible to tasks it spawns)."""
+    timings: Dict[str, float] = {}
+    _current_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float, per_request: bool = True) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_timings.get() if per_request else None
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+
+
+def merge_timings(timings: Optional[Dict[str, float]]) -> None:
+    """Add stage timings (ms) measured elsewhere, e.g. on an executor thread, to the current request."""
+    current = _current_timings.get()
+    if current is not None and timings:
+        for name, value in timings.items():
+            current[name] = round(current.get(name, 0.0) + value, 3)
+
+
+@contextmanager
+def stage(name: str, per_request: bool = True) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start, per_request)
+
+
+def record_llm_usage(agent: str, response: Any) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    completion_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, agent=agent, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, agent=agent, kind="completion")
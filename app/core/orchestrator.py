@@ -1,11 +1,30 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import asyncio
+import copy
+import logging
+import time
+import uuid
+import numpy as np
+from .chunking import document_id
+from .context import ContextPacker, parse_model_budgets
+from .deadline import DeadlineExceeded, DegradationPolicy, current_budget, remaining_seconds, start_budget
+from .ingestion import IngestionManager
+from .lazy import import_times
+from .llm_client import LLMUnavailableError, configure_llm_client
+from .metrics import CONTEXT_TOKENS, INDEX_DOCUMENTS, merge_timings, record_stage, stage, start_request_timings
+from .quality import QualityTracker
+from .semantic_cache import SemanticCache
 from ..agents.query_agent import QueryUnderstandingAgent
 from ..agents.retrieval_agent import RetrievalAgent
 from ..agents.response_agent import ResponseGenerationAgent
 
+logger = logging.getLogger(__name__)
+
 class AgentOrchestrator:    
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
+        # One rate-limited, retrying LLM client shared by every agent.
+        self.llm_client = configure_llm_client(self.config.get("llm", {}))
         
         self.query_agent = QueryUnderstandingAgent(
             name="query_understanding",
@@ -21,45 +40,555 @@ class AgentOrchestrator:
             name="response_generation",
             config=self.config.get("response_agent", {})
         )
+        
+        self.quality_tracker = QualityTracker(
+            max_entries=self.config.get("response_agent", {}).get("quality_results_max", 1000)
+        )
+        
+        cache_config = self.config.get("semantic_cache", {})
+        self.semantic_cache = None
+        if cache_config.get("enabled", False):
+            # Sized from the first query embedding: the embedding model loads during warm-up.
+            self.semantic_cache = SemanticCache(
+                threshold=cache_config.get("threshold", 0.95),
+                ttl_seconds=cache_config.get("ttl_seconds", 3600),
+                max_entries=cache_config.get("max_entries", 1000)
+            )
+        
+        context_config = self.config.get("context", {})
+        self.context_packer = None
+        if context_config.get("enabled", True):
+            self.context_packer = ContextPacker(
+                token_budget=context_config.get("token_budget", 2000),
+                model_budgets=parse_model_budgets(context_config.get("model_budgets")),
+                dedup_threshold=context_config.get("dedup_threshold", 0.95),
+                mmr_lambda=context_config.get("mmr_lambda", 0.7)
+            )
+        
+        ingestion_config = self.config.get("ingestion", {})
+        self.ingestion = IngestionManager(
+            self.ingest_documents,
+            self.delete_documents,
+            spool_dir=ingestion_config.get("spool_dir"),
+            batch_size=ingestion_config.get("batch_size", 256),
+            max_queued_jobs=ingestion_config.get("max_queued_jobs", 4),
+            max_upload_bytes=ingestion_config.get("max_upload_bytes", 0),
+            keep_jobs=ingestion_config.get("keep_jobs", 100)
+        )
+        
+        degradation_config = self.config.get("degradation", {})
+        # Default per-request deadline in seconds; 0 = none.
+        self.deadline_seconds = degradation_config.get("deadline_seconds", 0)
+        self.degradation = DegradationPolicy(
+            enabled=degradation_config.get("enabled", True),
+            max_in_flight=degradation_config.get("max_in_flight", 32),
+            safety_factor=degradation_config.get("safety_factor", 1.5)
+        )
+        self.active_queries = 0
+        
+        INDEX_DOCUMENTS.set_function(lambda: len(self.retrieval_agent.documents))
+    
+    @property
+    def agents(self) -> List[Any]:
+        return [self.retrieval_agent, self.query_agent, self.response_agent]
+    
+    def warm_up(self) -> bool:
+        """
+        Load every agent's models, SDKs and indexes (blocking; the server runs this in a
+        background thread). A failed agent is logged and warmed up again on first use.
+        """
+        for agent in self.agents:
+            try:
+                agent.warm_up()
+                logger.info("Agent %s ready after %.2fs", agent.name, agent.warm_up_seconds)
+            except Exception:
+                logger.exception("Warm-up of agent %s failed", agent.name)
+        return self.ready
+    
+    @property
+    def ready(self) -> bool:
+        return all(agent.ready for agent in self.agents)
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "agents": {agent.name: agent.get_readiness() for agent in self.agents},
+            "import_seconds": import_times()
+        }
     
-    async def process_query(self, query: str, top_k: int = 3) -> Dict[str, Any]:
+    async def process_query(self, query: str, top_k: int = 3, search_params: Optional[Dict[str, Any]] = None,
+                            deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Answer one query within ``deadline_seconds`` (default: the configured deadline; 0 for
+        none). Stages still running at the deadline are cancelled; optional stages the
+        degradation policy cannot afford are skipped and listed in ``skipped_stages``.
+        """
+        timings = start_request_timings()
+        budget = start_budget(self.deadline_seconds if deadline_seconds is None else deadline_seconds)
+        self.active_queries += 1
         try:
-            query_analysis = self.query_agent.run(query)
+            start = time.perf_counter()
+            cache_key = self._cache_key(top_k, search_params)
+            embedding, corpus_version, cached = await self._within_deadline("cache_lookup", self._lookup_cache(query, cache_key))
+            if cached is not None:
+                result = copy.deepcopy(cached["value"])
+                result["cache"] = {"hit": True, "similarity": cached["similarity"], "cached_at": cached["cached_at"]}
+                record_stage("total", time.perf_counter() - start)
+                return {**result, "skipped_stages": [], "timings": timings}
             
-            retrieval_results = await self.retrieval_agent.run_async({
-                "query": query,
-                "top_k": top_k
-            })
+            query_analysis, retrieval_results = await self._analyze_and_retrieve(query, top_k, search_params)
+            context, packing = await self._within_deadline(
+                "context_packing", self._pack_context(query, retrieval_results.get("results", []))
+            )
             
-            response = self.response_agent.run({
+            response = await self._timed("generation", self.response_agent.run_async({
                 "query": query,
-                "context": retrieval_results.get("results", [])
-            })
+                "context": context
+            }))
+            response.update(await self._handle_quality(query, context, response["response"], response["response_id"]))
+            if packing is not None:
+                response["context_packing"] = packing
             
-            return {
+            result = {
                 "query_analysis": query_analysis,
                 "retrieval_results": retrieval_results,
                 "response": response,
                 "status": "success"
             }
+            self._store_cache(embedding, result, corpus_version, time.perf_counter() - start, cache_key)
+            record_stage("total", time.perf_counter() - start)
+            return {**result, "cache": {"hit": False}, "skipped_stages": budget.skipped_stages, "timings": timings}
             
         except Exception as e:
             return {
                 "status": "error",
                 "error": str(e),
-                "query": query
+                "query": query,
+                "retryable": isinstance(e, LLMUnavailableError),
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "skipped_stages": budget.skipped_stages,
+                "timings": timings
             }
+        finally:
+            self.active_queries -= 1
+    
+    async def stream_query(self, query: str, top_k: int = 3, search_params: Optional[Dict[str, Any]] = None,
+                           deadline_seconds: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``metadata``, ``token``... and ``done`` events (or a final ``error`` event)."""
+        response_id = str(uuid.uuid4())
+        timings = start_request_timings()
+        budget = start_budget(self.deadline_seconds if deadline_seconds is None else deadline_seconds)
+        self.active_queries += 1
+        try:
+            start = time.perf_counter()
+            cache_key = self._cache_key(top_k, search_params)
+            embedding, corpus_version, cached = await self._within_deadline("cache_lookup", self._lookup_cache(query, cache_key))
+            if cached is not None:
+                result = cached["value"]
+                response = result["response"]
+                yield {"event": "metadata", "data": {
+                    "response_id": response["response_id"],
+                    "query_analysis": result["query_analysis"],
+                    "sources": [doc.get("metadata", {}) for doc in result["retrieval_results"].get("results", [])],
+                    "context_used": response["context_used"],
+                    "cache": {"hit": True, "similarity": cached["similarity"]}
+                }}
+                yield {"event": "token", "data": {"text": response["response"]}}
+                record_stage("total", time.perf_counter() - start)
+                yield {"event": "done", "data": {
+                    "response_id": response["response_id"],
+                    "quality_status": response.get("quality_status"),
+                    "skipped_stages": [],
+                    "timings": timings
+                }}
+                return
+            
+            query_analysis, retrieval_results = await self._analyze_and_retrieve(query, top_k, search_params)
+            context, packing = await self._within_deadline(
+                "context_packing", self._pack_context(query, retrieval_results.get("results", []))
+            )
+            yield {"event": "metadata", "data": {
+                "response_id": response_id,
+                "query_analysis": query_analysis,
+                "sources": [doc.get("metadata", {}) for doc in context],
+                "context_used": len(context),
+                "context_packing": packing,
+                "cache": {"hit": False}
+            }}
+            
+            parts = []
+            generation_start = time.perf_counter()
+            async for text in self.response_agent.stream({"query": query, "context": context}):
+                if not parts:
+                    record_stage("first_token", time.perf_counter() - generation_start)
+                parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+            record_stage("generation", time.perf_counter() - generation_start)
+            self.degradation.observe("generation", time.perf_counter() - generation_start)
+            
+            generated_response = "".join(parts).strip()
+            quality = await self._handle_quality(query, context, generated_response, response_id)
+            self._store_cache(embedding, {
+                "query_analysis": query_analysis,
+                "retrieval_results": retrieval_results,
+                "response": {
+                    "query": query,
+                    "response": generated_response,
+                    "response_id": response_id,
+                    "context_used": len(context),
+                    **({"context_packing": packing} if packing is not None else {}),
+                    **quality
+                },
+                "status": "success"
+            }, corpus_version, time.perf_counter() - start, cache_key)
+            record_stage("total", time.perf_counter() - start)
+            yield {"event": "done", "data": {
+                "response_id": response_id,
+                **quality,
+                "skipped_stages": budget.skipped_stages,
+                "timings": timings
+            }}
+        except Exception as e:
+            yield {"event": "error", "data": {
+                "response_id": response_id,
+                "error": str(e),
+                "deadline_exceeded": isinstance(e, DeadlineExceeded)
+            }}
+        finally:
+            self.active_queries -= 1
+    
+    async def process_batch(self, queries: List[str], top_k: int = 3, search_params: Optional[Dict[str, Any]] = None,
+                            concurrency: Optional[int] = None, include_analysis: bool = False) -> List[Dict[str, Any]]:
+        results = [None] * len(queries)
+        async for item in self.stream_batch(queries, top_k, search_params, concurrency, include_analysis):
+            results[item["index"]] = item
+        return results
     
-    def add_documents(self, documents: List[str]) -> None:
-        self.retrieval_agent.add_documents(documents)
+    async def stream_batch(self, queries: List[str], top_k: int = 3, search_params: Optional[Dict[str, Any]] = None,
+                           concurrency: Optional[int] = None,
+                           include_analysis: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many queries, yielding one result per query as it completes. Cache
+        lookups and retrieval are batched (one encode, one index search); analysis and
+        generation run under a concurrency limit. Failures are reported per item.
+        """
+        start = time.perf_counter()
+        # Batches have no deadline, whatever the caller's context carries.
+        start_budget(None)
+        concurrency = concurrency or self.config.get("batch", {}).get("concurrency", 8)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        corpus_version = self.retrieval_agent.corpus_version
+        cache_key = self._cache_key(top_k, search_params)
+        
+        embeddings: List[Optional[np.ndarray]] = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            if isinstance(query, str) and query.strip():
+                pending.append(i)
+            else:
+                yield {"index": i, "query": query, "status": "error", "error": "Query must be a non-empty string"}
+        
+        if self.semantic_cache is not None and pending:
+            try:
+                encoded = await self.retrieval_agent.encode_async([queries[i] for i in pending])
+            except Exception as e:
+                for i in pending:
+                    yield {"index": i, "query": queries[i], "status": "error", "error": str(e)}
+                return
+            candidates, pending = pending, []
+            for i, embedding in zip(candidates, encoded):
+                embeddings[i] = embedding
+                cached = self.semantic_cache.lookup(embedding, corpus_version, cache_key)
+                if cached is not None:
+                    self._resolve_quality(cached["value"]["response"])
+                if cached is None:
+                    pending.append(i)
+                else:
+                    yield {"index": i, **copy.deepcopy(cached["value"]), "cache": {"hit": True, "similarity": cached["similarity"]}}
+        if not pending:
+            return
+        
+        analyses: Dict[int, Dict[str, Any]] = {}
+        # Query analysis (and so reformulation) is still shed under load; only running items count as load.
+        analysis_skipped: Dict[int, str] = {}
+        if include_analysis or self.retrieval_agent.multi_query:
+            async def analyze(i: int):
+                async with semaphore:
+                    reason = self.degradation.skip_reason("query_analysis", self.active_queries + 1, None)
+                    if reason is not None:
+                        analysis_skipped[i] = reason
+                        return None
+                    self.active_queries += 1
+                    try:
+                        return await self._timed("query_analysis", self.query_agent.run_async(queries[i]))
+                    finally:
+                        self.active_queries -= 1
+            outcomes = await asyncio.gather(*(analyze(i) for i in pending), return_exceptions=True)
+            for i, outcome in zip(pending, outcomes):
+                if outcome is not None and not isinstance(outcome, Exception):
+                    analyses[i] = outcome
+        
+        try:
+            retrievals = await self._timed("retrieval", self.retrieval_agent.search_batch_async([{
+                "query": queries[i],
+                "top_k": top_k,
+                "queries": analyses.get(i, {}).get("reformulations", []) if self.retrieval_agent.multi_query else [],
+                **(search_params or {})
+            } for i in pending]))
+        except Exception as e:
+            for i in pending:
+                yield {"index": i, "query": queries[i], "status": "error", "error": str(e)}
+            return
+        
+        async def generate(i: int, retrieval_results: Dict[str, Any]) -> Dict[str, Any]:
+            # Each item runs as its own task, so this budget only records the item's skipped stages.
+            budget = start_budget(None)
+            if i in analysis_skipped:
+                budget.skip("query_analysis", analysis_skipped[i])
+                if self.retrieval_agent.multi_query:
+                    budget.skip("reformulation", analysis_skipped[i])
+            try:
+                async with semaphore:
+                    # Counted as load only while running, not while waiting for the semaphore.
+                    self.active_queries += 1
+                    try:
+                        context, packing = await self._pack_context(queries[i], retrieval_results.get("results", []))
+                        response = await self._timed("generation", self.response_agent.run_async({"query": queries[i], "context": context}))
+                        response.update(await self._handle_quality(queries[i], context, response["response"], response["response_id"]))
+                    finally:
+                        self.active_queries -= 1
+                    if packing is not None:
+                        response["context_packing"] = packing
+                result = {
+                    "query_analysis": analyses.get(i),
+                    "retrieval_results": retrieval_results,
+                    "response": response,
+                    "status": "success"
+                }
+                self._store_cache(embeddings[i], result, corpus_version, time.perf_counter() - start, cache_key)
+                return {"index": i, **result, "cache": {"hit": False}, "skipped_stages": budget.skipped_stages}
+            except Exception as e:
+                return {"index": i, "query": queries[i], "status": "error", "error": str(e)}
+        
+        for retrieval in retrievals:
+            retrieval.pop("timings", None)
+        tasks = [asyncio.ensure_future(generate(i, retrieval)) for i, retrieval in zip(pending, retrievals)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _cache_key(self, top_k: int, search_params: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+        """Cached answers are only reused for the same retrieval settings."""
+        params = search_params or {}
+        return (top_k, params.get("mode") or self.retrieval_agent.retrieval_mode, params.get("nprobe"), params.get("ef_search"))
+    
+    async def _lookup_cache(self, query: str,
+                            key: Tuple[Any, ...]) -> Tuple[Optional[np.ndarray], int, Optional[Dict[str, Any]]]:
+        corpus_version = self.retrieval_agent.corpus_version
+        if self.semantic_cache is None:
+            return None, corpus_version, None
+        with stage("cache_lookup"):
+            embedding = (await self.retrieval_agent.encode_async([query]))[0]
+            cached = self.semantic_cache.lookup(embedding, corpus_version, key)
+            if cached is not None:
+                self._resolve_quality(cached["value"]["response"])
+            return embedding, corpus_version, cached
+    
+    def _resolve_quality(self, response: Dict[str, Any]) -> None:
+        """Record the final background quality result in a cached answer once it is known."""
+        if response.get("quality_status") != "pending":
+            return
+        quality = self.quality_tracker.get(response.get("response_id"))
+        if quality is None:
+            # Evicted from the tracker: the result can no longer be fetched.
+            response["quality_status"] = "unavailable"
+        elif quality["status"] == "complete":
+            response["quality_status"] = "complete"
+            response["quality_metrics"] = quality["quality_metrics"]
+        elif quality["status"] == "error":
+            response["quality_status"] = "error"
+    
+    def _store_cache(self, embedding: Optional[np.ndarray], result: Dict[str, Any], corpus_version: int,
+                     latency: float, key: Tuple[Any, ...]) -> None:
+        budget = current_budget()
+        if budget is not None and "reformulation" in budget.skipped:
+            # Retrieved without the reformulations; a later hit would replay the degraded answer.
+            return
+        if self.semantic_cache is not None and embedding is not None:
+            self.semantic_cache.store(embedding, result, corpus_version, latency, key)
+    
+    async def _analyze_and_retrieve(self, query: str, top_k: int,
+                                    search_params: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        retrieval_input = {
+            "query": query,
+            "top_k": top_k,
+            **(search_params or {})
+        }
+        reformulate = self.retrieval_agent.multi_query
+        if reformulate:
+            # Waiting for the reformulations puts query analysis on the critical path.
+            reason = self._skip_reason("query_analysis", ("retrieval", "generation"))
+            if reason is not None:
+                self._skip("reformulation", reason)
+                reformulate = False
+        if reformulate:
+            # Multi-query retrieval searches with the reformulations, so it has to wait for them.
+            query_analysis, skipped = await self._analyze(query, ("retrieval", "generation"))
+            if skipped is not None:
+                self._skip("reformulation", skipped)
+            retrieval_input["queries"] = query_analysis.get("reformulations", [])
+            retrieval_results = await self._timed("retrieval", self.retrieval_agent.run_async(retrieval_input))
+        else:
+            # Retrieval does not depend on the query analysis, so both run concurrently.
+            (query_analysis, _), retrieval_results = await asyncio.gather(
+                self._analyze(query, ("generation",)),
+                self._timed("retrieval", self.retrieval_agent.run_async(retrieval_input))
+            )
+        # Embedding and index search run on executor threads and report their own timings.
+        merge_timings(retrieval_results.pop("timings", None))
+        return query_analysis, retrieval_results
+    
+    async def _analyze(self, query: str, required: Tuple[str, ...]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Query analysis, or the keyword-only fallback when it is skipped (returned with the reason)."""
+        reason = self._skip_reason("query_analysis", required)
+        if reason is None:
+            try:
+                return await self._timed(
+                    "query_analysis", self.query_agent.run_async(query), reserve=self.degradation.estimate(*required)
+                ), None
+            except DeadlineExceeded:
+                # Cut off to leave time for the required stages.
+                reason = "timeout"
+        self._skip("query_analysis", reason)
+        return self.query_agent.quick_analysis(query), reason
+    
+    async def _pack_context(self, query: str,
+                            results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        if self.context_packer is None or not results:
+            return results, None
+        with stage("context_packing"):
+            # Embeddings of the query and retrieved passages are normally embedding-cache hits.
+            vectors = await self.retrieval_agent.encode_async([query] + [doc["document"] for doc in results])
+            context, packing = self.context_packer.pack(vectors[0], results, vectors[1:], self.response_agent.model_name)
+        CONTEXT_TOKENS.inc(packing["tokens_used"], kind="used")
+        CONTEXT_TOKENS.inc(packing["tokens_saved"], kind="saved")
+        return context, packing
+    
+    async def _timed(self, stage_name: str, awaitable: Awaitable[Any], per_request: bool = True,
+                     reserve: float = 0.0) -> Any:
+        if not per_request:
+            # Runs in its own task after the response is sent, so it is not bound by the request deadline.
+            start_budget(None)
+        start = time.perf_counter()
+        try:
+            with stage(stage_name, per_request):
+                return await self._within_deadline(stage_name, awaitable, reserve)
+        finally:
+            self.degradation.observe(stage_name, time.perf_counter() - start)
+    
+    async def _within_deadline(self, stage_name: str, awaitable: Awaitable[Any], reserve: float = 0.0) -> Any:
+        """Await a stage, cancelling it if it would leave less than ``reserve`` seconds before the deadline."""
+        budget = current_budget()
+        if budget is None:
+            return await awaitable
+        return await budget.run(stage_name, awaitable, reserve)
+    
+    def _skip_reason(self, stage_name: str, required: Tuple[str, ...] = ()) -> Optional[str]:
+        return self.degradation.skip_reason(stage_name, self.active_queries, remaining_seconds(), required)
+    
+    def _skip(self, stage_name: str, reason: str) -> None:
+        budget = current_budget()
+        if budget is not None:
+            budget.skip(stage_name, reason)
+    
+    async def _handle_quality(self, query: str, context: List[Dict[str, Any]], response: str,
+                              response_id: str) -> Dict[str, Any]:
+        mode = self.response_agent.quality_analysis
+        if mode == "inline":
+            reason = self._skip_reason("quality_scoring")
+            if reason is None:
+                try:
+                    return {
+                        "quality_status": "complete",
+                        "quality_metrics": await self._timed(
+                            "quality_scoring", self.response_agent.analyze_quality(query, context, response)
+                        )
+                    }
+                except DeadlineExceeded:
+                    reason = "timeout"
+            self._skip("quality_scoring", reason)
+            return {"quality_status": "skipped"}
+        if mode == "background":
+            # Adds no latency but competes for LLM capacity, so it is only shed under load.
+            reason = self.degradation.skip_reason("quality_scoring", self.active_queries, None)
+            if reason is not None:
+                self._skip("quality_scoring", reason)
+                return {"quality_status": "skipped"}
+            # Finishes after the response is sent, so it only feeds the histogram.
+            self.quality_tracker.schedule(response_id, self._timed(
+                "quality_scoring", self.response_agent.analyze_quality(query, context, response), per_request=False
+            ))
+            return {"quality_status": "pending"}
+        return {"quality_status": "disabled"}
+    
+    def get_quality(self, response_id: str) -> Optional[Dict[str, Any]]:
+        return self.quality_tracker.get(response_id)
+    
+    def add_documents(self, documents: List[Union[str, Dict[str, Any]]]) -> Dict[str, int]:
+        return self.retrieval_agent.add_documents(*self._split_documents(documents))
+    
+    def ingest_documents(self, batches: Iterable[List[Union[str, Dict[str, Any]]]],
+                         progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """Upsert batches of documents as one change, committed after the last batch."""
+        return self.retrieval_agent.ingest((self._split_documents(batch) for batch in batches), progress)
+    
+    @staticmethod
+    def _split_documents(documents: List[Union[str, Dict[str, Any]]]) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        texts, metadata, ids = [], [], []
+        for document in documents:
+            if isinstance(document, str):
+                texts.append(document)
+                metadata.append({})
+                ids.append(document_id(document))
+            else:
+                if not isinstance(document.get("text"), str):
+                    raise ValueError("Document objects must have a 'text' field")
+                texts.append(document["text"])
+                metadata.append(document.get("metadata") or {})
+                ids.append(document.get("id") or document_id(document["text"], metadata[-1]))
+        return texts, metadata, ids
+    
+    def delete_documents(self, ids: Optional[List[str]] = None, sources: Optional[List[str]] = None) -> int:
+        return self.retrieval_agent.delete_documents(ids, sources)
+    
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.retrieval_agent.get_document(doc_id)
     
     def clear_index(self) -> None:
         self.retrieval_agent.clear_index()
     
+    def save_index(self) -> Optional[int]:
+        return self.retrieval_agent.save_index()
+    
+    def flush_index(self) -> Optional[int]:
+        return self.retrieval_agent.flush_index()
+    
     def get_system_status(self) -> Dict[str, Any]:
         return {
             "query_agent": self.query_agent.get_status(),
             "retrieval_agent": self.retrieval_agent.get_status(),
             "response_agent": self.response_agent.get_status(),
-            "index_stats": self.retrieval_agent.get_index_stats()
+            "index_stats": self.retrieval_agent.get_index_stats(),
+            "llm": self.llm_client.get_stats(),
+            "quality_analysis": self.quality_tracker.get_stats(),
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "degradation": {
+                **self.degradation.get_stats(),
+                "deadline_seconds": self.deadline_seconds,
+                "active_queries": self.active_queries
+            },
+            "ingestion_jobs": self.ingestion.get_stats()
         } 
\ No newline at end of file
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class QualityTracker:
+    """
+    Runs response-quality scoring as background tasks and keeps the most recent
+    results, keyed by response id, so clients can fetch them after the answer.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, response_id: str, analysis: Awaitable[Dict[str, Any]]) -> None:
+        self._store(response_id, {"status": "pending", "created_at": time.time()})
+        task = asyncio.ensure_future(self._run(response_id, analysis))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, response_id: str, analysis: Awaitable[Dict[str, Any]]) -> None:
+        try:
+            metrics = await analysis
+            self._store(response_id, {"status": "complete", "quality_metrics": metrics, "completed_at": time.time()})
+        except Exception as e:
+            logger.warning("Quality analysis for %s failed: %s", response_id, e)
+            self._store(response_id, {"status": "error", "error": str(e), "completed_at": time.time()})
+
+    def _store(self, response_id: str, result: Dict[str, Any]) -> None:
+        self._results[response_id] = {"response_id": response_id, **result}
+        self._results.move_to_end(response_id)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def get(self, response_id: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(response_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"tracked_responses": len(self._results), "pending_tasks": len(self._tasks)}
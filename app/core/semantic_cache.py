@@ -0,0 +1,121 @@
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cache of answered queries looked up by embedding similarity.
+
+    Query embeddings are kept L2-normalized in a fixed-size matrix, so a lookup is
+    one matrix-vector product. Entries expire after ``ttl_seconds``; when the cache
+    is full the expired or least recently used slot is reused. Every entry belongs
+    to a corpus version and the whole cache is dropped when that version changes. An
+    entry only matches lookups with the same ``key`` (e.g. the retrieval settings).
+    Without a ``dimension`` the matrix is sized from the first embedding seen.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, dimension), dtype="float32") if dimension else None
+        self._expires_at = np.zeros(max_entries, dtype="float64")
+        self._last_used = np.zeros(max_entries, dtype="float64")
+        self._values = [None] * max_entries
+        # Keys are interned to ids so a lookup masks other keys with one comparison.
+        self._key_ids = np.full(max_entries, -1, dtype=np.int64)
+        self._keys: Dict[Hashable, int] = {}
+        self._corpus_version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _normalize(self, embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32").reshape(self.dimension or -1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _allocate(self, vector: np.ndarray) -> None:
+        if self._vectors is None:
+            self.dimension = len(vector)
+            self._vectors = np.zeros((self.max_entries, self.dimension), dtype="float32")
+
+    def _check_version(self, corpus_version: int) -> None:
+        if corpus_version != self._corpus_version:
+            if self._corpus_version is not None and any(value is not None for value in self._values):
+                self.invalidations += 1
+            self._expires_at[:] = 0
+            self._values = [None] * self.max_entries
+            self._corpus_version = corpus_version
+
+    def _key_id(self, key: Hashable) -> int:
+        return self._keys.setdefault(key, len(self._keys))
+
+    def lookup(self, embedding: np.ndarray, corpus_version: int, key: Hashable = None) -> Optional[Dict[str, Any]]:
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._allocate(query)
+            self._check_version(corpus_version)
+            similarities = self._vectors @ query
+            similarities[(self._expires_at <= now) | (self._key_ids != self._key_id(key))] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[slot] = now
+            entry = self._values[slot]
+            self.saved_seconds += entry["latency"]
+            return {"value": entry["value"], "similarity": similarity, "cached_at": entry["cached_at"]}
+
+    def store(self, embedding: np.ndarray, value: Any, corpus_version: int, latency: float = 0.0,
+              key: Hashable = None) -> None:
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if corpus_version != self._corpus_version:
+                # The corpus changed while this answer was being generated.
+                return
+            self._allocate(vector)
+            free = np.flatnonzero(self._expires_at <= now)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._key_ids[slot] = self._key_id(key)
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._values[slot] = {"value": value, "latency": latency, "cached_at": now}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires_at[:] = 0
+            self._values = [None] * self.max_entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(np.count_nonzero(self._expires_at > time.time())),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "saved_latency_seconds": round(self.saved_seconds, 3),
+            }
@@ -0,0 +1,308 @@
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .lazy import lazy_import
+
+faiss = lazy_import("faiss")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# How flat, HNSW and IVF-Flat indexes store vectors: as-is, or per-dimension scalar quantized.
+VECTOR_STORAGES = ("float32", "float16", "int8")
+# cosine = inner product over L2-normalized vectors.
+METRICS = ("l2", "cosine")
+
+DEFAULT_INDEX_CONFIG: Dict[str, Any] = {
+    "index_type": "flat",
+    "nlist": 0,
+    "nprobe": 8,
+    "pq_m": 48,
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    "min_ann_documents": 1000,
+    "vector_storage": "float32",
+    "metric": "l2",
+}
+
+
+def index_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(DEFAULT_INDEX_CONFIG)
+    merged.update({key: value for key, value in config.items() if key in DEFAULT_INDEX_CONFIG and value is not None})
+    if merged["index_type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type {merged['index_type']!r}, expected one of {INDEX_TYPES}")
+    if merged["vector_storage"] not in VECTOR_STORAGES:
+        raise ValueError(f"Unknown vector_storage {merged['vector_storage']!r}, expected one of {VECTOR_STORAGES}")
+    if merged["metric"] not in METRICS:
+        raise ValueError(f"Unknown metric {merged['metric']!r}, expected one of {METRICS}")
+    return merged
+
+
+def faiss_metric(config: Dict[str, Any]) -> int:
+    return faiss.METRIC_INNER_PRODUCT if config["metric"] == "cosine" else faiss.METRIC_L2
+
+
+def _quantizer_type(storage: str) -> int:
+    return faiss.ScalarQuantizer.QT_fp16 if storage == "float16" else faiss.ScalarQuantizer.QT_8bit
+
+
+def _nlist_for(num_vectors: int, config: Dict[str, Any]) -> int:
+    if config["nlist"]:
+        return int(config["nlist"])
+    # Rule of thumb: ~4*sqrt(n) lists, with at least 39 training points per centroid.
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def min_train_size(config: Dict[str, Any], num_vectors: int) -> int:
+    index_type = config["index_type"]
+    if index_type == "flat":
+        # int8 ranges are trained per dimension, so wait for a representative sample.
+        return config["min_ann_documents"] if config["vector_storage"] == "int8" else 0
+    if index_type == "hnsw":
+        return config["min_ann_documents"]
+    required = 39 * _nlist_for(num_vectors, config)
+    if index_type == "ivf_pq":
+        required = max(required, 39 * (1 << config["pq_nbits"]))
+    return max(required, config["min_ann_documents"])
+
+
+def build_index(dimension: int, config: Dict[str, Any], train_vectors: Optional[np.ndarray] = None) -> Any:
+    """
+    Build (and train) the configured index type. Falls back to an exact flat index
+    when there are too few vectors to train or to benefit from an ANN structure.
+    """
+    index_type = config["index_type"]
+    storage = config["vector_storage"]
+    metric = faiss_metric(config)
+    num_vectors = 0 if train_vectors is None else len(train_vectors)
+    if num_vectors < min_train_size(config, num_vectors):
+        return faiss.IndexFlat(dimension, metric)
+    if index_type == "flat":
+        if storage == "float32":
+            return faiss.IndexFlat(dimension, metric)
+        index = faiss.IndexScalarQuantizer(dimension, _quantizer_type(storage), metric)
+        if not index.is_trained:
+            index.train(train_vectors)
+        return index
+
+    if index_type == "hnsw":
+        if storage == "float32":
+            index = faiss.IndexHNSWFlat(dimension, config["hnsw_m"], metric)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, _quantizer_type(storage), config["hnsw_m"], metric)
+            index.train(train_vectors)
+        index.hnsw.efConstruction = config["ef_construction"]
+        index.hnsw.efSearch = config["ef_search"]
+        return index
+
+    nlist = _nlist_for(num_vectors, config)
+    if index_type == "ivf_flat":
+        codes = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}[storage]
+        index = faiss.index_factory(dimension, f"IVF{nlist},{codes}", metric)
+    else:
+        # PQ codes are already compressed; vector_storage does not apply.
+        if dimension % config["pq_m"] != 0:
+            raise ValueError(f"pq_m={config['pq_m']} must divide the embedding dimension {dimension}")
+        index = faiss.index_factory(dimension, f"IVF{nlist},PQ{config['pq_m']}x{config['pq_nbits']}", metric)
+    index.train(train_vectors)
+    faiss.extract_index_ivf(index).nprobe = config["nprobe"]
+    return index
+
+
+def is_id_mapped(index: Any) -> bool:
+    # IVF indexes store the ids they are given; flat and HNSW need an IndexIDMap2 wrapper.
+    return isinstance(index, faiss.IndexIDMap) or faiss.try_extract_index_ivf(index) is not None
+
+
+def base_index(index: Any) -> Any:
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+
+def build_id_index(dimension: int, config: Dict[str, Any], train_vectors: Optional[np.ndarray] = None) -> Any:
+    """Like ``build_index``, but the result accepts ``add_with_ids`` and returns those ids from search."""
+    index = build_index(dimension, config, train_vectors)
+    return index if is_id_mapped(index) else faiss.IndexIDMap2(index)
+
+
+def index_ids(index: Any) -> np.ndarray:
+    """Ids held by a flat or HNSW index; positions unless it is wrapped in an IndexIDMap."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def reconstruct_with_ids(index: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (ids, vectors) of every vector stored in a flat or HNSW index."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        raise ValueError("Vectors cannot be reconstructed from an IVF index")
+    base = base_index(index)
+    ids = index_ids(index)
+    if base.ntotal == 0:
+        return ids, np.zeros((0, base.d), dtype="float32")
+    return ids, base.reconstruct_n(0, base.ntotal)
+
+
+def _empty_like(index: Any) -> Any:
+    # Built from parameters rather than clone + reset, which fails on memory-mapped indexes.
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        if isinstance(storage, faiss.IndexScalarQuantizer):
+            empty = faiss.IndexHNSWSQ(index.d, storage.sq.qtype, index.hnsw.nb_neighbors(1), index.metric_type)
+        else:
+            empty = faiss.IndexHNSWFlat(index.d, index.hnsw.nb_neighbors(1), index.metric_type)
+        empty.hnsw.efConstruction = index.hnsw.efConstruction
+        empty.hnsw.efSearch = index.hnsw.efSearch
+        return empty
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return faiss.IndexScalarQuantizer(index.d, index.sq.qtype, index.metric_type)
+    return faiss.IndexFlat(index.d, index.metric_type)
+
+
+def rebuild_with_ids(index: Any, keep_ids: Optional[np.ndarray] = None,
+                     stored: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Any:
+    """
+    Copy a flat or HNSW index into a fresh IndexIDMap2 with the same parameters,
+    keeping only ``keep_ids`` if given. Used to migrate position-addressed indexes
+    and to drop HNSW tombstones, which cannot be removed in place. ``stored`` gives
+    exact (ids, vectors) to use instead of decoding quantized ones from the index.
+    """
+    ids, vectors = stored if stored is not None else reconstruct_with_ids(index)
+    if keep_ids is not None:
+        mask = np.isin(ids, keep_ids)
+        ids, vectors = ids[mask], vectors[mask]
+    empty = _empty_like(base_index(index))
+    if not empty.is_trained and not len(ids):
+        # Nothing to train the quantizer on: start over from an exact index, like build_index.
+        empty = faiss.IndexFlat(empty.d, empty.metric_type)
+    rebuilt = faiss.IndexIDMap2(empty)
+    if not rebuilt.is_trained:
+        rebuilt.train(vectors)
+    if len(ids):
+        rebuilt.add_with_ids(vectors, ids)
+    return rebuilt
+
+
+def remove_ids(index: Any, ids: np.ndarray) -> bool:
+    """Remove ids from the index; returns False for HNSW, which has to tombstone them instead."""
+    if index_kind(index) == "hnsw":
+        return False
+    index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64)))
+    return True
+
+
+def index_bytes(index: Any) -> int:
+    """Approximate size of an index: vector codes, ids, graph links and coarse centroids."""
+    if index is None:
+        return 0
+    total = 0
+    if isinstance(index, faiss.IndexIDMap):
+        # IndexIDMap2 also keeps a reverse id -> position map.
+        total += index.id_map.size() * 8 * (2 if isinstance(index, faiss.IndexIDMap2) else 1)
+        index = base_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return total + ivf.invlists.compute_ntotal() * (ivf.code_size + 8) + ivf.nlist * ivf.d * 4
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        total += hnsw.neighbors.size() * 4 + hnsw.levels.size() * 4 + hnsw.offsets.size() * 8
+        index = faiss.downcast_index(index.storage)
+    return total + index.ntotal * index.code_size
+
+
+def index_storage(index: Any) -> str:
+    """float32, float16 or int8 for flat, HNSW and IVF-Flat indexes; pq for IVF-PQ."""
+    if index is None:
+        return "none"
+    index = base_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        index = faiss.downcast_index(ivf)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "float16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "float32"
+
+
+def uses_inner_product(index: Any) -> bool:
+    return index is not None and index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def exact_rerank(queries: np.ndarray, candidates: np.ndarray, vectors: Any, k: int,
+                 inner_product: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score candidate rows (-1 for none) with full-precision ``vectors[rows]`` and keep
+    the best ``k`` per query, returned like ``index.search``: similarities for inner
+    product, squared distances for L2, and -1 rows for missing results.
+    """
+    distances = np.full((len(queries), k), -np.inf if inner_product else np.inf, dtype="float32")
+    rows = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, (query, candidate) in enumerate(zip(queries, candidates)):
+        candidate = candidate[candidate >= 0]
+        if not len(candidate):
+            continue
+        stored = vectors[candidate]
+        if inner_product:
+            scores = stored @ query
+            order = np.argsort(-scores, kind="stable")[:k]
+        else:
+            scores = ((stored - query) ** 2).sum(axis=1)
+            order = np.argsort(scores, kind="stable")[:k]
+        distances[i, :len(order)] = scores[order]
+        rows[i, :len(order)] = candidate[order]
+    return distances, rows
+
+
+def index_kind(index: Any) -> str:
+    if index is None:
+        return "none"
+    index = base_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def describe_index(index: Any) -> str:
+    kind = index_kind(index)
+    if kind == "none":
+        return "Not initialized"
+    storage = index_storage(index)
+    # Plain float32 L2 indexes keep their historical names.
+    suffix = "" if storage in ("float32", "pq") else f" {storage}"
+    if uses_inner_product(index):
+        suffix += " cosine"
+    if kind == "hnsw":
+        return f"FAISS HNSW{suffix} (efSearch={base_index(index).hnsw.efSearch})"
+    if kind == "flat":
+        return f"FAISS Flat{suffix}" if suffix else "FAISS FlatL2"
+    ivf = faiss.extract_index_ivf(index)
+    label = "IVF-PQ" if kind == "ivf_pq" else "IVF-Flat"
+    return f"FAISS {label}{suffix} (nlist={ivf.nlist}, nprobe={ivf.nprobe})"
+
+
+def search_params(index: Any, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                  selector: Any = None) -> Any:
+    """Per-query search parameters, so concurrent queries never mutate shared index state."""
+    kind = index_kind(index)
+    if kind == "hnsw" and (ef_search or selector is not None):
+        params = faiss.SearchParametersHNSW(efSearch=int(ef_search or base_index(index).hnsw.efSearch))
+        if selector is not None:
+            params.sel = selector
+        return params
+    if kind in ("ivf_flat", "ivf_pq") and (nprobe or selector is not None):
+        params = faiss.SearchParametersIVF(nprobe=int(nprobe or faiss.extract_index_ivf(index).nprobe))
+        if selector is not None:
+            params.sel = selector
+        return params
+    if selector is not None:
+        params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+    return None
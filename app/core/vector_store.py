@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class VectorStore:
+    """
+    Full-precision float32 vectors kept row-aligned with the document store, next to a
+    quantized index. Stores opened from disk with ``mmap`` are read-only views of the
+    file, so only the rows touched by re-ranking are paged in; the first write copies
+    them into memory.
+    """
+
+    def __init__(self, dimension: int, vectors: Optional[np.ndarray] = None):
+        self.dimension = dimension
+        self._size = 0
+        self._data = np.zeros((0, dimension), dtype="float32")
+        if vectors is not None:
+            self.extend(vectors)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, slice):
+            return np.asarray(self._data[:self._size][rows])
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size and (rows.min() < 0 or rows.max() >= self._size):
+            raise IndexError("vector index out of range")
+        return np.asarray(self._data[rows])
+
+    def extend(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        if not len(vectors):
+            return
+        self._reserve(self._size + len(vectors))
+        self._data[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+
+    def filter(self, keep: np.ndarray) -> "VectorStore":
+        """Return a new store holding only the rows where ``keep`` is True."""
+        return VectorStore(self.dimension, self._data[:self._size][np.asarray(keep, dtype=bool)])
+
+    def save(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            np.save(f, np.ascontiguousarray(self._data[:self._size]))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def open(cls, path: Path, mmap: bool = True) -> "VectorStore":
+        data = np.load(path, mmap_mode="r" if mmap else None)
+        store = cls(data.shape[1])
+        store._data = data
+        store._size = len(data)
+        return store
+
+    @property
+    def mmapped(self) -> bool:
+        return isinstance(self._data, np.memmap)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._size * self.dimension * 4)
+
+    def _reserve(self, size: int) -> None:
+        # Amortized growth; also copies a memory-mapped store into writable memory.
+        if len(self._data) < size or not self._data.flags.writeable:
+            grown = np.zeros((max(size, 2 * len(self._data)), self.dimension), dtype="float32")
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
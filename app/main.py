@@ -1,15 +1,32 @@
+import time
+_import_start = time.perf_counter()
+
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import router
-from app.config import HOST, PORT, DEBUG, GOOGLE_API_KEY
-import google.generativeai as genai
+from fastapi.responses import JSONResponse
+from app.api.endpoints import orchestrator, router
+from app.config import HOST, PORT, DEBUG, WARM_UP_ON_STARTUP
+from app.core.lazy import record_import
+
+# Heavy dependencies (torch, faiss, the Gemini SDK) are not imported here; see /ready.
+record_import("app", time.perf_counter() - _import_start)
 
-genai.configure(api_key=GOOGLE_API_KEY)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP_ON_STARTUP:
+        # The port opens right away; /ready reports when models and indexes are loaded.
+        threading.Thread(target=orchestrator.warm_up, name="warm-up", daemon=True).start()
+    yield
+    # Write any snapshot still deferred by RETRIEVAL_AGENT_SAVE_INTERVAL_SECONDS.
+    orchestrator.flush_index()
 
 app = FastAPI(
     title="AIFAQ Multi-Agent RAG System",
     description="A sophisticated multi-agent system for enhancing AI-generated FAQ responses",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -37,6 +54,11 @@ async def health_check():
         "version": "0.1.0"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    readiness = orchestrator.get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
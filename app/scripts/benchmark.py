@@ -0,0 +1,297 @@
+"""
+Offline end-to-end benchmark: no Gemini key and no docs crawl required.
+
+Suites:
+    ingest  HTML parsing and chunking throughput (pages/s, chunks/s) on a synthetic corpus
+    embed   bulk embedding and indexing throughput (docs/s) and peak RSS for mixed-length
+            documents, with the embedding engine in-process and on worker pools
+    search  RetrievalAgent search latency as the corpus grows
+    query   /query p50/p95/p99 latency and QPS at several concurrency levels, served
+            in-process with the LLM replaced by a deterministic fake
+
+Usage (from the project root):
+    python -m app.scripts.benchmark --output bench.json
+    python -m app.scripts.benchmark --suites query --concurrency 1,8,32 --llm-latency-ms 200
+    python -m app.scripts.benchmark --suites embed --embedding-workers 0,2,4 --embedding-threads 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.scripts.synthetic_corpus import generate_corpus, mixed_length_texts, synthetic_queries, synthetic_texts
+
+SUITES = ("ingest", "embed", "search", "query")
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    values = np.asarray(latencies_ms or [0.0])
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_ingest(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.scripts.ingest_docs import ingest
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        docs_dir = os.path.join(tmp, "docs")
+        generate_corpus(docs_dir, args.pages, seed=args.seed)
+        for workers in args.ingest_workers:
+            output = os.path.join(tmp, f"chunks-{workers}.jsonl")
+            start = time.perf_counter()
+            counts = ingest(docs_dir, output, workers=workers)
+            elapsed = time.perf_counter() - start
+            rows.append({
+                "workers": workers,
+                "pages": counts["files"],
+                "chunks": counts["chunks"],
+                "seconds": round(elapsed, 3),
+                "pages_per_second": round(counts["files"] / elapsed, 2),
+                "chunks_per_second": round(counts["chunks"] / elapsed, 2),
+            })
+            print(f"ingest workers={workers}: {rows[-1]['pages_per_second']} pages/s, "
+                  f"{rows[-1]['chunks_per_second']} chunks/s")
+    return rows
+
+
+def bench_embed(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.agents.retrieval_agent import RetrievalAgent
+
+    texts = mixed_length_texts(args.embed_documents, seed=args.seed)
+    rows = []
+    for workers in args.embedding_workers:
+        agent = RetrievalAgent(name="retrieval", config={
+            "model_name": args.model,
+            "index_type": args.index_type,
+            "embedding_cache_size": 0,
+            "micro_batching": False,
+            "lexical_index": False,
+            "embedding_workers": workers,
+            "embedding_batch_size": args.embedding_batch_size,
+            "embedding_threads": args.embedding_threads,
+            "ingest_chunk_size": args.ingest_chunk_size,
+        })
+        agent.warm_up()
+        engine = agent.embedding_engine
+        # Start the pool and load the model in every worker before timing.
+        engine.encode(texts[:args.embedding_batch_size * max(1, workers)])
+        start = time.perf_counter()
+        agent.add_documents(texts)
+        elapsed = time.perf_counter() - start
+        stats = engine.get_stats()
+        engine.close()
+        rows.append({
+            "workers": workers,
+            "threads": args.embedding_threads,
+            "batch_size": args.embedding_batch_size,
+            "documents": len(texts),
+            "seconds": round(elapsed, 3),
+            "documents_per_second": round(len(texts) / elapsed, 2),
+            "padding_ratio": stats["padding_ratio"],
+            # ru_maxrss never decreases, so the parent figure is the peak of the whole run so far.
+            "peak_rss_mib": round(stats["peak_rss_bytes"] / 2 ** 20, 1),
+            "worker_peak_rss_mib": round(stats["worker_peak_rss_bytes"] / 2 ** 20, 1),
+        })
+        print(f"embed workers={workers}: {rows[-1]['documents_per_second']} docs/s, "
+              f"peak RSS {rows[-1]['peak_rss_mib']} MiB + {rows[-1]['worker_peak_rss_mib']} MiB in workers")
+    return rows
+
+
+def bench_search(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.agents.retrieval_agent import RetrievalAgent
+
+    agent = RetrievalAgent(name="retrieval", config={
+        "model_name": args.model,
+        "index_type": args.index_type,
+        # Measure real query encoding, not cache lookups.
+        "embedding_cache_size": 0,
+        "micro_batching": False,
+    })
+    sizes = sorted(args.sizes)
+    texts = synthetic_texts(sizes[-1], seed=args.seed)
+    queries = synthetic_queries(args.queries, seed=args.seed + 1)
+
+    rows = []
+    loaded = 0
+    for size in sizes:
+        start = time.perf_counter()
+        for offset in range(loaded, size, 1000):
+            agent.add_documents(texts[offset:min(size, offset + 1000)])
+        add_seconds = time.perf_counter() - start
+        added, loaded = size - loaded, size
+
+        for mode in args.modes:
+            for query in queries[:5]:
+                agent.search({"query": query, "top_k": args.top_k, "mode": mode})
+            totals: List[float] = []
+            stages: Dict[str, List[float]] = {"embedding": [], "vector_search": [], "lexical_search": []}
+            for query in queries:
+                start = time.perf_counter()
+                result = agent.search({"query": query, "top_k": args.top_k, "mode": mode})
+                totals.append((time.perf_counter() - start) * 1000)
+                for stage, values in stages.items():
+                    if stage in result["timings"]:
+                        values.append(result["timings"][stage])
+
+            rows.append({
+                "documents": size,
+                "mode": mode,
+                "index_type": agent.get_index_stats()["index_type"],
+                "add_documents_per_second": round(added / add_seconds, 2) if add_seconds else None,
+                **summarize(totals),
+                **{f"{stage}_p50_ms": round(float(np.percentile(values, 50)), 3) for stage, values in stages.items() if values},
+                **{f"{stage}_p99_ms": round(float(np.percentile(values, 99)), 3) for stage, values in stages.items() if values},
+            })
+            print(f"search n={size} mode={mode}: p50={rows[-1]['p50_ms']}ms p99={rows[-1]['p99_ms']}ms")
+    return rows
+
+
+async def _query_load(client: Any, queries: List[str], concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int, query: str) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/query", json={"id": str(i), "content": query})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, query) for i, query in enumerate(queries)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "qps": round(len(queries) / elapsed, 2),
+        **summarize(latencies),
+    }
+
+
+async def _bench_query(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import httpx
+    from app.main import app
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        texts = synthetic_texts(args.query_corpus, seed=args.seed)
+        for offset in range(0, len(texts), 500):
+            response = await client.post("/documents", json={"documents": texts[offset:offset + 500]})
+            response.raise_for_status()
+
+        await _query_load(client, synthetic_queries(5, seed=10_000), 1)
+        for level, concurrency in enumerate(args.concurrency):
+            # Fresh queries per level so semantic cache hits (if enabled) do not carry over.
+            queries = synthetic_queries(args.requests, seed=args.seed + 100 + level)
+            rows.append(await _query_load(client, queries, concurrency))
+            print(f"query concurrency={concurrency}: {rows[-1]['qps']} qps, p50={rows[-1]['p50_ms']}ms "
+                  f"p95={rows[-1]['p95_ms']}ms p99={rows[-1]['p99_ms']}ms errors={rows[-1]['errors']}")
+    return rows
+
+
+def bench_query(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.scripts.fake_llm import fake_llm
+
+    # The API builds its orchestrator from the environment at import time.
+    os.environ["RETRIEVAL_AGENT_INDEX_DIR"] = ""
+    os.environ["RETRIEVAL_AGENT_MODEL"] = args.model
+    os.environ["RETRIEVAL_AGENT_INDEX_TYPE"] = args.index_type
+    os.environ["SEMANTIC_CACHE_ENABLED"] = str(args.semantic_cache)
+    os.environ["RESPONSE_AGENT_QUALITY_ANALYSIS"] = args.quality_analysis
+    with fake_llm(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, ms_per_token=args.llm_ms_per_token):
+        return asyncio.run(_bench_query(args))
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="sentence-transformers embedding model")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=200, help="synthetic pages for the ingest suite")
+    parser.add_argument("--ingest-workers", type=_int_list, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--embed-documents", type=int, default=5000, help="mixed-length documents for the embed suite")
+    parser.add_argument("--embedding-workers", type=_int_list, default=[0, 2],
+                        help="embedding worker processes for the embed suite (0 = in-process)")
+    parser.add_argument("--embedding-batch-size", type=int, default=32)
+    parser.add_argument("--embedding-threads", type=int, default=0, help="torch threads per worker (0 = default)")
+    parser.add_argument("--ingest-chunk-size", type=int, default=2048)
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 5000, 20000], help="corpus sizes for the search suite")
+    parser.add_argument("--queries", type=int, default=200, help="queries per corpus size in the search suite")
+    parser.add_argument("--modes", type=lambda value: [mode.strip() for mode in value.split(",") if mode.strip()],
+                        default=["dense", "lexical", "hybrid"], help="retrieval modes for the search suite")
+    parser.add_argument("--query-corpus", type=int, default=2000, help="documents loaded for the query suite")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="fake LLM time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--quality-analysis", default="background", choices=["background", "inline", "off"])
+    parser.add_argument("--semantic-cache", action="store_true")
+    args = parser.parse_args()
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+    runners = {"ingest": bench_ingest, "embed": bench_embed, "search": bench_search, "query": bench_query}
+    for suite in suites:
+        results[suite] = runners[suite](args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Recall/latency/memory benchmark for the retrieval index types and vector storages.
+
+Usage (from the project root):
+    python -m app.scripts.benchmark_index --synthetic 50000
+    python -m app.scripts.benchmark_index --documents app/scripts/processed_docs.json
+    python -m app.scripts.benchmark_index --storages float32,float16,int8 --metric cosine --rerank-factor 4
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.vector_index import (
+    INDEX_TYPES, VECTOR_STORAGES, build_index, describe_index, exact_rerank, index_bytes, index_config, search_params,
+    uses_inner_product
+)
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    # Clustered gaussian data behaves much more like sentence embeddings than uniform noise.
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dimension)).astype("float32")
+    assignments = rng.integers(0, len(centers), size=count)
+    return centers[assignments] + 0.3 * rng.normal(size=(count, dimension)).astype("float32")
+
+
+def embed_documents(path: str, model_name: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    with open(path, "r", encoding="utf-8") as f:
+        documents = json.load(f)["documents"]
+    texts = [doc if isinstance(doc, str) else doc["text"] for doc in documents]
+    model = SentenceTransformer(model_name)
+    return np.asarray(model.encode(texts, batch_size=64, show_progress_bar=True), dtype="float32")
+
+
+def recall_at_k(results: np.ndarray, ground_truth: np.ndarray) -> float:
+    k = ground_truth.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(truth)) for row, truth in zip(results, ground_truth))
+    return hits / (len(ground_truth) * k)
+
+
+def benchmark_type(index_type: str, vectors: np.ndarray, queries: np.ndarray, ground_truth: np.ndarray,
+                   k: int, overrides: Dict[str, Any], rerank_factor: int = 0) -> Dict[str, Any]:
+    config = index_config({**overrides, "index_type": index_type, "min_ann_documents": 0})
+    start = time.perf_counter()
+    index = build_index(vectors.shape[1], config, vectors)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+
+    params = search_params(index, config["nprobe"], config["ef_search"])
+    latencies: List[float] = []
+    results = np.empty((len(queries), k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+
+    row = {
+        "index_type": index_type,
+        "vector_storage": config["vector_storage"],
+        "description": describe_index(index),
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": index_bytes(index),
+        f"recall@{k}": round(recall_at_k(results, ground_truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+    }
+    if rerank_factor:
+        # Re-rank k * rerank_factor candidates against the float32 vectors (the agent's sidecar).
+        latencies = []
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], k * rerank_factor, params=params)
+            _, ids = exact_rerank(query[None, :], ids, vectors, k, uses_inner_product(index))
+            latencies.append((time.perf_counter() - start) * 1000)
+            results[i] = ids[0]
+        row[f"rerank_recall@{k}"] = round(recall_at_k(results, ground_truth), 4)
+        row["rerank_p50_ms"] = round(float(np.percentile(latencies, 50)), 4)
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", help="processed_docs.json to embed instead of synthetic vectors")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--synthetic", type=int, default=20000, help="number of synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--storages", default="float32",
+                        help=f"comma-separated vector storages to compare ({', '.join(VECTOR_STORAGES)})")
+    parser.add_argument("--metric", default="l2", choices=["l2", "cosine"])
+    parser.add_argument("--rerank-factor", type=int, default=0,
+                        help="also measure exact re-ranking of k * this many candidates (0: off)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.documents:
+        vectors = embed_documents(args.documents, args.model)
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dimension)
+    if args.metric == "cosine":
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype("float32")
+    if args.metric == "cosine":
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    flat = build_index(vectors.shape[1], index_config({"index_type": "flat", "metric": args.metric}))
+    flat.add(vectors)
+    _, ground_truth = flat.search(queries, args.k)
+
+    overrides = {"nlist": args.nlist, "nprobe": args.nprobe, "pq_m": args.pq_m, "ef_search": args.ef_search,
+                 "metric": args.metric}
+    rows = []
+    for index_type in args.types.split(","):
+        for storage in args.storages.split(","):
+            if index_type.strip() == "ivf_pq" and storage.strip() != args.storages.split(",")[0].strip():
+                continue  # PQ codes ignore vector_storage
+            rows.append(benchmark_type(index_type.strip(), vectors, queries, ground_truth, args.k,
+                                       {**overrides, "vector_storage": storage.strip()}, args.rerank_factor))
+
+    print(f"{len(vectors)} vectors, dimension {vectors.shape[1]}, {len(queries)} queries, "
+          f"float32 vectors: {vectors.nbytes / 2**20:.1f} MiB")
+    for row in rows:
+        rerank = f" rerank recall@{args.k}={row[f'rerank_recall@{args.k}']:.4f}" if args.rerank_factor else ""
+        print(f"{row['description']:<50} recall@{args.k}={row[f'recall@{args.k}']:.4f}{rerank} "
+              f"size={row['index_bytes'] / 2**20:.1f}MiB p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms "
+              f"build={row['build_seconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "queries": len(queries), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Deterministic stand-in for the Gemini SDK, used by benchmark.py to serve queries offline.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+from app.core.lazy import lazy_import
+
+genai = lazy_import("google.generativeai")
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int, completion_tokens: int):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=completion_tokens,
+            total_token_count=prompt_tokens + completion_tokens
+        )
+
+
+class FakeGenerativeModel:
+    """
+    Deterministic local stand-in for ``genai.GenerativeModel``.
+
+    The same prompt always gets the same text and the same latency: ``latency_ms``
+    (plus up to ``jitter_ms`` derived from the prompt hash) before the first token,
+    then ``ms_per_token`` for every generated word. Query analysis and quality
+    prompts get valid JSON; answers are built from the prompt's context.
+    """
+
+    def __init__(self, model_name: str = "fake", latency_ms: float = 50.0, jitter_ms: float = 0.0,
+                 ms_per_token: float = 0.0, answer_words: int = 60, **kwargs: Any):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_token = ms_per_token
+        self.answer_words = answer_words
+        self.calls = 0
+
+    def generate_content(self, contents: Any, generation_config: Any = None, stream: bool = False,
+                         **kwargs: Any) -> Any:
+        self.calls += 1
+        prompt = str(contents)
+        text = self._respond(prompt, generation_config)
+        time.sleep(self._delay(prompt, text))
+        response = FakeResponse(text, _count_words(prompt), _count_words(text))
+        return iter([response]) if stream else response
+
+    async def generate_content_async(self, contents: Any, generation_config: Any = None, stream: bool = False,
+                                     **kwargs: Any) -> Any:
+        self.calls += 1
+        prompt = str(contents)
+        text = self._respond(prompt, generation_config)
+        if stream:
+            await asyncio.sleep(self._first_token_delay(prompt))
+            return self._stream(prompt, text)
+        await asyncio.sleep(self._delay(prompt, text))
+        return FakeResponse(text, _count_words(prompt), _count_words(text))
+
+    async def _stream(self, prompt: str, text: str) -> AsyncIterator[FakeResponse]:
+        words = text.split(" ")
+        prompt_tokens = _count_words(prompt)
+        for start in range(0, len(words), 8):
+            piece = words[start:start + 8]
+            if start:
+                await asyncio.sleep(len(piece) * self.ms_per_token / 1000)
+            chunk = " ".join(piece) + (" " if start + 8 < len(words) else "")
+            yield FakeResponse(chunk, prompt_tokens, min(start + 8, len(words)))
+
+    def _first_token_delay(self, prompt: str) -> float:
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "little")
+        return max(0.0, self.latency_ms + random.Random(seed).uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _delay(self, prompt: str, text: str) -> float:
+        return self._first_token_delay(prompt) + _count_words(text) * self.ms_per_token / 1000
+
+    def _respond(self, prompt: str, generation_config: Any) -> str:
+        if "relevance_score" in prompt:
+            return json.dumps({
+                "relevance_score": 4,
+                "accuracy_score": 4,
+                "clarity_score": 4,
+                "context_usage_score": 4,
+                "suggested_improvements": []
+            })
+        if _config_value(generation_config, "response_mime_type") == "application/json":
+            return json.dumps(self._analysis(_query(prompt)))
+        return self._answer(prompt)
+
+    def _analysis(self, query: str) -> Dict[str, Any]:
+        concepts = list(dict.fromkeys(word for word in re.findall(r"[\w.\-/]+", query.lower()) if len(word) > 3))
+        return {
+            "concepts": concepts[:5],
+            "reformulations": [f"{query} explained", f"how does {' '.join(concepts[:3])} work"],
+            "metadata": {"query_type": "factual", "priority": 3, "complexity": 2, "required_context": ["documentation"]}
+        }
+
+    def _answer(self, prompt: str) -> str:
+        words = _context(prompt).split()
+        if not words:
+            return "I am sorry, but I cannot answer the query as there is no context provided."
+        return " ".join(words[:self.answer_words])
+
+
+def _config_value(config: Any, key: str) -> Any:
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(key)
+    return getattr(config, key, None)
+
+
+def _query(prompt: str) -> str:
+    match = re.search(r"Query:\s*(.*)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def _context(prompt: str) -> str:
+    _, _, rest = prompt.partition("Context:")
+    rest = rest.split("Please provide", 1)[0]
+    # Drop the "Document N (source - section):" headers added by the response agent.
+    return re.sub(r"^\s*Document \d+.*:\s*$", "", rest, flags=re.MULTILINE)
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+@contextmanager
+def fake_llm(**options: Any) -> Iterator[List[FakeGenerativeModel]]:
+    """Replace ``genai.GenerativeModel`` with ``FakeGenerativeModel``; yields the models created."""
+    original = genai.GenerativeModel
+    models: List[FakeGenerativeModel] = []
+
+    def factory(model_name: str = "fake", **kwargs: Any) -> FakeGenerativeModel:
+        model = FakeGenerativeModel(model_name, **{**kwargs, **options})
+        models.append(model)
+        return model
+
+    genai.GenerativeModel = factory
+    try:
+        yield models
+    finally:
+        genai.GenerativeModel = original
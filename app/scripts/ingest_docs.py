@@ -1,11 +1,27 @@
 import os
 import sys
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from bs4 import BeautifulSoup, Comment
 import json
-from typing import List, Dict
+from typing import Any, Iterator, List, Dict, Optional, Tuple
 
-def extract_text_from_html(html_content: str) -> str:
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from app.core.chunking import chunk_document, chunk_id, tokenizer_counter
+
+MANIFEST_VERSION = 1
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+BLOCK_TAGS = ["p", "li", "pre", "dt", "dd", "tr", "blockquote", "table", "div"]
+HEADING_MARKER = "\x00HEADING\x00"
+SKIPPED_PREFIXES = (
+    "Navigation", "Next", "Previous", "© Copyright", "Built with",
+    "Note:", "Note ", "Warning:", "Warning ", "Important:", "Important ",
+)
+
+def _prepare_soup(html_content: str):
     soup = BeautifulSoup(html_content, 'html.parser')
     
     for comment in soup.find_all(text=lambda text: isinstance(text, Comment)):
@@ -16,52 +32,215 @@ def extract_text_from_html(html_content: str) -> str:
     
     main_content = soup.find("div", class_="document")
     if main_content:
-        text = main_content.get_text()
-    else:
-        text = soup.body.get_text() if soup.body else soup.get_text()
-    
+        return main_content
+    return soup.body if soup.body else soup
+
+def _clean_lines(text: str) -> List[str]:
     lines = (line.strip() for line in text.splitlines())
     chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = '\n'.join(chunk for chunk in chunks if chunk and 
-                    not chunk.startswith("Navigation") and
-                    not chunk.startswith("Next") and
-                    not chunk.startswith("Previous") and
-                    not chunk.startswith("© Copyright") and
-                    not chunk.startswith("Built with") and
-                    not chunk.startswith("Note:") and
-                    not chunk.startswith("Note ") and
-                    not chunk.startswith("Warning:") and
-                    not chunk.startswith("Warning ") and
-                    not chunk.startswith("Important:") and
-                    not chunk.startswith("Important "))
+    return [chunk for chunk in chunks if chunk and not chunk.startswith(SKIPPED_PREFIXES)]
+
+def extract_text_from_html(html_content: str) -> str:
+    return '\n'.join(_clean_lines(_prepare_soup(html_content).get_text()))
+
+def extract_sections_from_html(html_content: str) -> Tuple[str, List[Tuple[str, int, int]]]:
+    """
+    Extract the page text together with (section title, start, end) character
+    spans, splitting at every heading.
+    """
+    root = _prepare_soup(html_content)
+    for heading in root.find_all(HEADING_TAGS):
+        title = " ".join(heading.get_text().split()).rstrip("¶").strip()
+        heading.replace_with(f"\n{HEADING_MARKER}{title}\n")
+    for block in root.find_all(BLOCK_TAGS):
+        block.append("\n")
+    
+    lines: List[str] = []
+    sections: List[Tuple[str, int, int]] = []
+    title, section_start, position = "", 0, 0
+    for line in _clean_lines(root.get_text()):
+        if line.startswith(HEADING_MARKER):
+            if position > section_start:
+                sections.append((title, section_start, position - 1))
+            title, section_start = line[len(HEADING_MARKER):], position
+            line = title
+            if not line:
+                continue
+        lines.append(line)
+        position += len(line) + 1
+    if position > section_start:
+        sections.append((title, section_start, position - 1))
     
-    return text
+    return '\n'.join(lines), sections
 
-def process_docs(docs_dir: str) -> List[str]:
-    documents = []
+_worker_counter = None
+
+def _init_worker(tokenizer: Optional[str]) -> None:
+    global _worker_counter
+    _worker_counter = tokenizer_counter(tokenizer) if tokenizer else None
+
+def process_file(task: Tuple[str, str, Optional[str], int, int]) -> Dict[str, Any]:
+    path, source, known_hash, max_tokens, overlap_tokens = task
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == known_hash:
+            return {"source": source, "sha256": digest, "unchanged": True, "records": []}
+        
+        text, sections = extract_sections_from_html(raw.decode('utf-8'))
+        records = []
+        if text.strip():
+            records = chunk_document(text, sections, source, max_tokens, overlap_tokens, _worker_counter)
+        return {"source": source, "sha256": digest, "unchanged": False, "records": records}
+    except Exception as e:
+        return {"source": source, "error": str(e), "records": []}
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+def save_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def iter_processed(docs_dir: str, previous: Optional[Dict[str, Any]] = None, workers: int = 1,
+                   max_tokens: int = 200, overlap_tokens: int = 40,
+                   tokenizer: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one result per HTML file, in a stable order. Files whose size and mtime
+    match ``previous`` are skipped without being read; files whose content hash
+    matches are reported as unchanged without being re-extracted.
+    """
     docs_path = Path(docs_dir)
+    previous = previous or {}
+    tasks = []
+    stats = {}
+    for html_file in sorted(docs_path.rglob("*.html")):
+        source = html_file.relative_to(docs_path).as_posix()
+        stat = html_file.stat()
+        stats[source] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        known = previous.get(source)
+        if known and known.get("mtime_ns") == stat.st_mtime_ns and known.get("size") == stat.st_size:
+            yield {**known, "source": source, "unchanged": True, "records": []}
+            continue
+        tasks.append((str(html_file), source, known.get("sha256") if known else None, max_tokens, overlap_tokens))
     
-    for html_file in docs_path.rglob("*.html"):
-        try:
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            text = extract_text_from_html(content)
-            if text.strip():
-                documents.append(text)
-        except Exception as e:
-            print(f"Error processing {html_file}: {str(e)}")
+    if workers <= 1:
+        _init_worker(tokenizer)
+        results = map(process_file, tasks)
+        for result in results:
+            yield {**stats[result["source"]], **result}
+        return
     
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tokenizer,)) as executor:
+        for result in executor.map(process_file, tasks, chunksize=8):
+            yield {**stats[result["source"]], **result}
+
+def process_docs(docs_dir: str, max_tokens: int = 200, overlap_tokens: int = 40,
+                 tokenizer: Optional[str] = None, workers: int = 1) -> List[Dict[str, Any]]:
+    documents = []
+    for result in iter_processed(docs_dir, None, workers, max_tokens, overlap_tokens, tokenizer):
+        if "error" in result:
+            print(f"Error processing {result['source']}: {result['error']}")
+        documents.extend(result["records"])
     return documents
 
-if __name__ == "__main__":
-    docs_dir = sys.argv[1] if len(sys.argv) > 1 else "/mnt/d/lfx/rtdocs"
+def ingest(docs_dir: str, output: str, workers: int = 1, incremental: bool = False,
+           manifest_path: Optional[str] = None, max_tokens: int = 200, overlap_tokens: int = 40,
+           tokenizer: Optional[str] = None) -> Dict[str, int]:
+    """
+    Stream chunk records to ``output`` as files finish processing. ``.jsonl`` outputs
+    get one record per line; anything else gets a ``{"documents": [...]}`` JSON object
+    suitable for ``POST /documents``. In incremental mode only new or modified pages
+    are written, followed by a ``{"delete": {"ids": [...], "sources": [...]}}`` record
+    for chunks of pages that shrank and for pages that were removed.
+    """
+    manifest_file = Path(manifest_path or output + ".manifest.json")
+    previous = load_manifest(manifest_file)["files"] if incremental else {}
+    current: Dict[str, Any] = {}
+    seen = set()
+    stale_ids: List[str] = []
+    counts = {"files": 0, "changed": 0, "unchanged": 0, "errors": 0, "chunks": 0, "removed": 0, "deleted_chunks": 0}
+    jsonl = output.endswith(".jsonl")
+    
+    with open(output, 'w', encoding='utf-8') as f:
+        if not jsonl:
+            f.write('{"documents": [\n')
+        for result in iter_processed(docs_dir, previous, workers, max_tokens, overlap_tokens, tokenizer):
+            counts["files"] += 1
+            seen.add(result["source"])
+            if "error" in result:
+                counts["errors"] += 1
+                print(f"Error processing {result['source']}: {result['error']}")
+                # Keep its entry, so its previously uploaded chunks are still tracked.
+                if result["source"] in previous:
+                    current[result["source"]] = previous[result["source"]]
+                continue
+            current[result["source"]] = {
+                "mtime_ns": result["mtime_ns"],
+                "size": result["size"],
+                "sha256": result["sha256"],
+                "chunks": previous[result["source"]].get("chunks", 0) if result["unchanged"] else len(result["records"]),
+            }
+            if result["unchanged"]:
+                counts["unchanged"] += 1
+                continue
+            counts["changed"] += 1
+            # Chunk ids are "<source>#<n>", so a shorter page leaves its tail chunks behind.
+            old_chunks = previous.get(result["source"], {}).get("chunks", 0)
+            stale_ids.extend(chunk_id(result["source"], i) for i in range(len(result["records"]), old_chunks))
+            for record in result["records"]:
+                if jsonl:
+                    f.write(json.dumps(record) + "\n")
+                else:
+                    f.write((",\n" if counts["chunks"] else "") + json.dumps(record))
+                counts["chunks"] += 1
+        # Pages that failed to parse keep their previously uploaded chunks.
+        removed = sorted(set(previous) - seen)
+        delete = {"ids": stale_ids, "sources": removed} if stale_ids or removed else None
+        if jsonl:
+            if delete:
+                f.write(json.dumps({"delete": delete}) + "\n")
+        else:
+            f.write('\n]' + (', "delete": ' + json.dumps(delete) if delete else '') + '}\n')
     
-    print(f"Processing documents from: {docs_dir}")
-    documents = process_docs(docs_dir)
+    counts["removed"] = len(removed)
+    counts["deleted_chunks"] = len(stale_ids)
+    save_manifest(manifest_file, {"version": MANIFEST_VERSION, "files": current})
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract and chunk HTML documentation for ingestion")
+    parser.add_argument("docs_dir", nargs="?", default="/mnt/d/lfx/rtdocs")
+    parser.add_argument("--output", default="processed_docs.json",
+                        help="output file; a .jsonl extension writes one chunk per line")
+    parser.add_argument("--chunk-tokens", type=int, default=200,
+                        help="maximum tokens per chunk (all-MiniLM-L6-v2 truncates at 256)")
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--tokenizer", help="count tokens with this Hugging Face tokenizer instead of the built-in estimate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of parser processes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only emit pages that are new or changed since the last run")
+    parser.add_argument("--manifest", help="manifest path (default: <output>.manifest.json)")
+    args = parser.parse_args()
     
-    output_file = "processed_docs.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({"documents": documents}, f, indent=2)
+    print(f"Processing documents from: {args.docs_dir}")
+    start = time.perf_counter()
+    counts = ingest(args.docs_dir, args.output, args.workers, args.incremental, args.manifest,
+                    args.chunk_tokens, args.overlap_tokens, args.tokenizer)
+    elapsed = time.perf_counter() - start
     
-    print(f"Processed {len(documents)} documents. Saved to {output_file}") 
\ No newline at end of file
+    print(f"Processed {counts['files']} pages in {elapsed:.1f}s ({counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} removed, {counts['errors']} errors, "
+          f"{counts['deleted_chunks']} stale chunks). "
+          f"Wrote {counts['chunks']} chunks to {args.output}")
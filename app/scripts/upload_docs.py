@@ -0,0 +1,92 @@
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, Iterator, List
+
+import requests
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    if path.endswith(".jsonl"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        yield from data["documents"]
+        if data.get("delete"):
+            yield {"delete": data["delete"]}
+
+def upload(path: str, url: str, batch_size: int = 256) -> Dict[str, int]:
+    """Upsert every chunk record, then apply the delete records written by ``ingest_docs.py --incremental``."""
+    batch: List[Dict[str, Any]] = []
+    totals = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    delete = {"ids": [], "sources": []}
+    for record in iter_records(path):
+        if "delete" in record:
+            delete["ids"].extend(record["delete"].get("ids", []))
+            delete["sources"].extend(record["delete"].get("sources", []))
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _post(url, batch, totals)
+            batch = []
+    if batch:
+        _post(url, batch, totals)
+    if delete["ids"] or delete["sources"]:
+        response = requests.post(f"{url.rstrip('/')}/documents/delete", json=delete, timeout=600)
+        response.raise_for_status()
+        totals["deleted"] = response.json().get("documents_deleted", 0)
+    return totals
+
+def upload_job(path: str, url: str, poll_seconds: float = 2.0) -> Dict[str, Any]:
+    """Stream a .jsonl file to ``POST /documents/jobs`` and wait for the job to finish."""
+    base = url.rstrip('/')
+    with open(path, 'rb') as f:
+        response = requests.post(f"{base}/documents/jobs", data=f, timeout=600,
+                                 headers={"Content-Type": "application/x-ndjson"})
+    response.raise_for_status()
+    job = response.json()
+    while job["state"] not in ("committed", "failed", "cancelled"):
+        time.sleep(poll_seconds)
+        response = requests.get(f"{base}/documents/jobs/{job['id']}", timeout=60)
+        response.raise_for_status()
+        job = response.json()
+        print(f"{job['state']}: {job['records']} records, {job['embedded']} embedded "
+              f"({job['embedded_per_second'] or 0} docs/s), {job['error_count']} errors")
+    return job
+
+def _post(url: str, batch: List[Dict[str, Any]], totals: Dict[str, int]) -> None:
+    response = requests.post(f"{url.rstrip('/')}/documents", json={"documents": batch}, timeout=600)
+    response.raise_for_status()
+    body = response.json()
+    for key in ("added", "updated", "unchanged"):
+        totals[key] += body.get(f"documents_{key}", 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload ingest_docs.py output to the API in batches")
+    parser.add_argument("path", help="processed_docs.jsonl or processed_docs.json")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--job", action="store_true",
+                        help="stream a .jsonl file as one background ingestion job, committed at the end")
+    args = parser.parse_args()
+    if args.job and not args.path.endswith(".jsonl"):
+        parser.error("--job needs a .jsonl file")
+
+    try:
+        if args.job:
+            job = upload_job(args.path, args.url)
+            if job["state"] != "committed":
+                print(f"Ingestion job {job['id']} {job['state']}: {job['error']}")
+                sys.exit(1)
+            totals = {key: job[key] for key in ("added", "updated", "unchanged", "deleted")}
+        else:
+            totals = upload(args.path, args.url, args.batch_size)
+    except requests.RequestException as e:
+        print(f"Upload failed: {e}")
+        sys.exit(1)
+    print(f"Uploaded to {args.url}: {totals['added']} added, {totals['updated']} updated, "
+          f"{totals['unchanged']} unchanged, {totals['deleted']} deleted")